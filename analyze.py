@@ -0,0 +1,171 @@
+from argparse import ArgumentParser
+from array import array
+from collections import Counter
+
+from imports import STOP_WORDS, DOMAIN_STOP_WORDS
+from utils.crawl_output import CrawlReader
+from utils.analytics_report import write_analytics_report
+from utils.index import IndexBuilder, IndexReader
+
+
+def rebuild_analytics(reader, out_file):
+    ''' Recompute the crawl_analytics.txt report from the crawl output. '''
+    urls = reader.strings("urls")
+    hosts = reader.strings("hosts")
+    tokens = reader.strings("tokens")
+    token_totals = array("Q", bytes(8 * len(tokens)))
+    subdomains = Counter()
+    unique_pages = 0
+    longest_words, longest_url = 0, None
+    for columns in reader.iter_columns(
+            ("url_id", "host_id", "unique", "word_count",
+             "token_offsets", "token_ids", "token_counts")):
+        offsets = columns["token_offsets"]
+        token_ids = columns["token_ids"]
+        token_counts = columns["token_counts"]
+        for row, unique in enumerate(columns["unique"]):
+            if not unique:
+                continue
+            unique_pages += 1
+            if columns["word_count"][row] > longest_words:
+                longest_words = columns["word_count"][row]
+                longest_url = urls[columns["url_id"][row]]
+            for i in range(offsets[row], offsets[row + 1]):
+                token_totals[token_ids[i]] += token_counts[i]
+            host = hosts[columns["host_id"][row]]
+            if host.endswith(".uci.edu") and host != "uci.edu":
+                subdomains[host] += 1
+
+    stop_words = set(STOP_WORDS)
+    word_freq, stopword_freq = Counter(), Counter()
+    for token_id, total in enumerate(token_totals):
+        if not total:
+            continue
+        token = tokens[token_id]
+        if token in stop_words:
+            stopword_freq[token] = total
+        elif len(token) >= 2 and token not in DOMAIN_STOP_WORDS:
+            word_freq[token] = total
+    write_analytics_report(
+        out_file, unique_pages, longest_words, longest_url,
+        word_freq, stopword_freq, subdomains)
+
+
+def write_links(reader, out_file):
+    ''' Write the link graph as "source_id<TAB>target_id" lines (ids index urls.txt). '''
+    with open(out_file, "w") as f:
+        for url_id, outlinks in reader.iter_links():
+            for target in outlinks:
+                f.write(f"{url_id}\t{target}\n")
+
+
+def graph_report(reader, out_file, priority_file=None, top=50):
+    '''
+    PageRank, in-degree and connected components of the crawl's link graph,
+    per uci.edu subdomain as well. With priority_file, also write the PageRank
+    of every url that was linked to but not downloaded yet (see PRIORITY).
+    '''
+    # numpy is only needed here, so the other commands start without it.
+    import numpy as np
+    from utils.graph import LinkGraph, group_totals
+
+    urls = reader.strings("urls")
+    hosts = reader.strings("hosts")
+    graph = LinkGraph.from_crawl_output(reader)
+    rank = graph.pagerank()
+    in_degree = graph.in_degree()
+    labels = graph.connected_components()
+    component_sizes = np.bincount(labels, minlength=graph.num_nodes)
+
+    # Host of every downloaded page (-1 for urls only seen as link targets).
+    node_host = np.full(graph.num_nodes, -1, dtype=np.int64)
+    crawled = np.zeros(graph.num_nodes, dtype=bool)
+    for columns in reader.iter_columns(("url_id", "host_id", "unique")):
+        url_ids = np.frombuffer(columns["url_id"], dtype=np.uint32)
+        unique = np.frombuffer(columns["unique"], dtype=np.uint8).astype(bool)
+        crawled[url_ids] = True
+        node_host[url_ids[unique]] = np.frombuffer(
+            columns["host_id"], dtype=np.uint32)[unique]
+    host_pages = group_totals(node_host, np.ones(graph.num_nodes), len(hosts))
+    host_rank = group_totals(node_host, rank, len(hosts))
+    host_in_degree = group_totals(node_host, in_degree.astype(float), len(hosts))
+
+    with open(out_file, "w") as f:
+        f.write(f"Nodes: {graph.num_nodes}\n")
+        f.write(f"Edges: {graph.num_edges}\n")
+        f.write(f"Downloaded pages: {int(crawled.sum())}\n")
+        f.write(f"Connected components: {int((component_sizes > 0).sum())}\n")
+        f.write(f"Largest component: {int(component_sizes.max(initial=0))} nodes\n")
+
+        f.write(f"\nTop {top} pages by PageRank (url, pagerank, in-degree):\n")
+        for node in np.argsort(-rank)[:top]:
+            f.write(f"{urls[node]}, {rank[node]:.6g}, {in_degree[node]}\n")
+
+        f.write("\nSubdomains under uci.edu (subdomain, pages, pagerank, in-links):\n")
+        for host_id in sorted(range(len(hosts)), key=hosts.__getitem__):
+            host = hosts[host_id]
+            if host_pages[host_id] and host.endswith(".uci.edu") and host != "uci.edu":
+                f.write(
+                    f"{host}, {int(host_pages[host_id])}, "
+                    f"{host_rank[host_id]:.6g}, {int(host_in_degree[host_id])}\n")
+
+    if priority_file:
+        with open(priority_file, "w") as f:
+            for node in np.argsort(-rank):
+                if not crawled[node]:
+                    f.write(f"{urls[node]}\t{rank[node]:.6g}\n")
+
+
+def build_index(reader, index_dir):
+    ''' Build the inverted index of every unique page in the crawl output. '''
+    urls = reader.strings("urls")
+    tokens = reader.strings("tokens")
+    builder = IndexBuilder(index_dir, restart=True)
+    for page in reader.iter_pages():
+        if page.unique:
+            builder.add_document(
+                urls[page.url_id],
+                {tokens[t]: c for t, c in zip(page.token_ids, page.token_counts)})
+    builder.finish()
+
+
+def search(index_dir, query, mode, k):
+    index = IndexReader(index_dir)
+    if mode == "rank":
+        for score, doc_id in index.search(query, k):
+            print(f"{score:.4f} {index.url(doc_id)}")
+    else:
+        doc_ids = index.boolean(query, mode)
+        for doc_id in doc_ids[:k]:
+            print(index.url(doc_id))
+        print(f"{len(doc_ids)} matching pages.")
+    index.close()
+
+
+def main(args):
+    if args.command == "search":
+        search(args.path, args.query, args.mode, args.k)
+        return
+    reader = CrawlReader(args.path)
+    if args.command == "report":
+        rebuild_analytics(reader, args.out or "crawl_analytics.txt")
+    elif args.command == "links":
+        write_links(reader, args.out or "links.tsv")
+    elif args.command == "graph":
+        graph_report(reader, args.out or "graph_report.txt", args.priority)
+    elif args.command == "index":
+        build_index(reader, args.out or "index")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument(
+        "command", choices=("report", "links", "graph", "index", "search"))
+    # Crawl output directory, or the index directory for "search".
+    parser.add_argument("path", type=str)
+    parser.add_argument("--out", type=str, default=None)
+    parser.add_argument("--priority", type=str, default=None)
+    parser.add_argument("--query", type=str, default="")
+    parser.add_argument("--mode", choices=("rank", "and", "or"), default="rank")
+    parser.add_argument("-k", type=int, default=10)
+    main(parser.parse_args())
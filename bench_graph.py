@@ -0,0 +1,44 @@
+from argparse import ArgumentParser
+import time
+
+import numpy as np
+
+from utils.graph import LinkGraph
+
+
+def synthetic_edges(num_nodes, num_edges, seed=0):
+    '''
+    Random link graph with a skewed in-degree: sources are uniform, targets
+    are Zipf(1.5) distributed, so a few pages get most of the links as on a
+    real site. Duplicates and self-links are left for LinkGraph to drop.
+    '''
+    rng = np.random.default_rng(seed)
+    sources = rng.integers(0, num_nodes, num_edges, dtype=np.int64)
+    targets = rng.zipf(1.5, num_edges) % num_nodes
+    return sources, targets.astype(np.int64)
+
+
+def main(args):
+    sources, targets = synthetic_edges(args.nodes, args.edges, args.seed)
+    start = time.perf_counter()
+    graph = LinkGraph.from_edges(sources, targets, args.nodes)
+    del sources, targets
+    built = time.perf_counter()
+    rank = graph.pagerank()
+    ranked = time.perf_counter()
+    labels = graph.connected_components()
+    done = time.perf_counter()
+    size = graph.indptr.nbytes + graph.indices.nbytes
+    print(f"Nodes: {graph.num_nodes}, edges after deduplication: {graph.num_edges}")
+    print(f"CSR: {size / 2 ** 20:.1f} MiB, {size / max(graph.num_edges, 1):.1f} bytes/edge")
+    print(f"Build: {built - start:.2f}s")
+    print(f"PageRank: {ranked - built:.2f}s (rank sum {rank.sum():.6f})")
+    print(f"Components: {done - ranked:.2f}s ({len(np.unique(labels))} components)")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=2000000)
+    parser.add_argument("--edges", type=int, default=20000000)
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
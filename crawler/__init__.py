@@ -1,14 +1,30 @@
+import signal
+import threading
+import time
+
 from utils import get_logger
+from utils.profiler import SamplingProfiler
 from crawler.frontier import Frontier
 from crawler.worker import Worker
+from helpers import open_crawl_output, open_index
 
 class Crawler(object):
     def __init__(self, config, restart, frontier_factory=Frontier, worker_factory=Worker):
         self.config = config
         self.logger = get_logger("CRAWLER")
         self.frontier = frontier_factory(config, restart)
+        if config.output_dir:
+            open_crawl_output(config.output_dir, restart)
+        if config.index_dir:
+            open_index(config.index_dir, restart)
         self.workers = list()
         self.worker_factory = worker_factory
+        self.stop_deadline = None
+        self.profiler = None
+        if config.profile_dir:
+            self.profiler = SamplingProfiler(
+                config.profile_dir, lambda: self.workers,
+                config.profile_rate, config.profile_window, self.logger)
 
     def start_async(self):
         self.workers = [
@@ -16,11 +32,46 @@ class Crawler(object):
             for worker_id in range(self.config.threads_count)]
         for worker in self.workers:
             worker.start()
+        if self.profiler is not None and not self.profiler.is_alive():
+            self.profiler.start()
 
     def start(self):
+        self.install_signal_handlers()
         self.start_async()
         self.join()
 
+    def install_signal_handlers(self):
+        # Signal handlers can only be installed from the main thread.
+        if threading.current_thread() is not threading.main_thread():
+            return
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, self.request_stop)
+        # SIGUSR1 switches the profiler on and off (not available on Windows).
+        if self.profiler is not None and hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, self.profiler.toggle)
+
+    def request_stop(self, signum=None, frame=None):
+        if self.stop_deadline is None:
+            self.logger.info(
+                f"Stopping: no new urls are handed out, waiting up to "
+                f"{self.config.shutdown_timeout}s for in-flight downloads.")
+            self.stop_deadline = time.monotonic() + self.config.shutdown_timeout
+            self.frontier.stop()
+        else:
+            # A second signal stops waiting for in-flight downloads.
+            self.stop_deadline = time.monotonic()
+
     def join(self):
-        for worker in self.workers:
-            worker.join()
+        while True:
+            alive = [worker for worker in self.workers if worker.is_alive()]
+            if not alive:
+                break
+            if (self.stop_deadline is not None
+                    and time.monotonic() >= self.stop_deadline):
+                self.logger.info(
+                    f"Not waiting for {len(alive)} workers, their urls are "
+                    f"kept for the next run.")
+                break
+            # Short timeouts so signal handlers run and the deadline is checked.
+            alive[0].join(0.5)
+        self.frontier.checkpoint()
@@ -1,17 +1,69 @@
 import os
+import heapq
+import pickle
 import shelve
+import time
 
-from threading import Thread, RLock
+from threading import Thread, Lock, RLock
 from queue import Queue, Empty
+from urllib.parse import urlparse
 
 from utils import get_logger, get_urlhash, normalize
-from scraper import is_valid
+from utils.download import download
+from utils.profiler import TimedLock
+from utils.robots import RobotsCache
+from utils.sitemap import iter_sitemap
+from utils.urlstore import UrlSet
+from helpers import (
+    dump_templates, load_templates,
+    dump_analytics_state, load_analytics_state, flush_crawl_outputs)
+from scraper import is_valid, host_allowed, normalize_url
+
+# Nested sitemap files followed per host (sitemap indexes can fan out).
+MAX_SITEMAP_FILES = 20
+# Sitemap urls are added to the frontier in batches of this size.
+SITEMAP_BATCH_SIZE = 1000
+# Learned url templates and the crawl analytics are written next to the save
+# file every N completions.
+STATE_SAVE_EVERY = 100
+# While only held-back urls are left, get_tbd_url waits for them in steps of
+# at most this many seconds (so a stop request is noticed).
+HOLD_POLL_INTERVAL = 1.0
+
+
+def _seen_key(url):
+    # get_urlhash ignores the scheme, so http and https urls share a save entry.
+    return url.partition("://")[2] or url
+
 
 class Frontier(object):
     def __init__(self, config, restart):
         self.logger = get_logger("FRONTIER")
         self.config = config
         self.to_be_downloaded = list()
+        # Every url in the save file (see _seen_key), so add_urls never probes it.
+        self.seen = UrlSet()
+        self.robots = RobotsCache(config, self.logger, config.robots_ttl)
+        self.sitemap_hosts = set()
+        # Host -> earliest time.monotonic() its next download may start.
+        self.next_fetch = dict()
+        self.templates_file = f"{self.config.save_file}.templates"
+        self.analytics_file = f"{self.config.save_file}.analytics"
+        self.checkpoint_file = f"{self.config.save_file}.checkpoint"
+        self.completed_count = 0
+        # Urls marked complete in the save file; tags the analytics snapshot.
+        self.save_completed = 0
+        # Periodic saves happen outside self.lock; this keeps them one at a time.
+        self.save_lock = Lock()
+        self.save_due = False
+        # Workers share the frontier; the lock also keeps checkpoints consistent.
+        self.lock = TimedLock("frontier", RLock())
+        # Urls handed out by get_tbd_url and not completed yet.
+        self.in_flight = set()
+        # Heap of (time.monotonic(), url): urls held back until that time.
+        self.held = list()
+        self.stopping = False
+        self.closed = False
         
         if not os.path.exists(self.config.save_file) and not restart:
             # Save file does not exist, but request to load save.
@@ -23,50 +75,368 @@ class Frontier(object):
             self.logger.info(
                 f"Found save file {self.config.save_file}, deleting it.")
             os.remove(self.config.save_file)
+        if restart:
+            for state_file in (
+                    self.templates_file, self.analytics_file,
+                    self.checkpoint_file):
+                if os.path.exists(state_file):
+                    os.remove(state_file)
         # Load existing save file, or create one if it does not exist.
         self.save = shelve.open(self.config.save_file)
         if restart:
-            for url in self.config.seed_urls:
-                self.add_url(url)
+            self.add_urls(self.config.seed_urls)
         else:
             # Set the frontier state with contents of save file.
-            self._parse_save_file()
+            self._load_templates()
+            if not self._load_checkpoint():
+                self._parse_save_file()
+            self._load_analytics()
             if not self.save:
-                for url in self.config.seed_urls:
-                    self.add_url(url)
+                self.add_urls(self.config.seed_urls)
+            if self.config.priority_file:
+                self._load_priority(self.config.priority_file)
 
     def _parse_save_file(self):
         ''' This function can be overridden for alternate saving techniques. '''
         total_count = len(self.save)
         tbd_count = 0
+        seen = list()
         for url, completed in self.save.values():
-            if not completed and is_valid(url):
+            seen.append(_seen_key(url))
+            if completed:
+                self.save_completed += 1
+            elif is_valid(url):
                 self.to_be_downloaded.append(url)
                 tbd_count += 1
+        # One bulk load instead of an insert per url.
+        self.seen.update(seen)
         self.logger.info(
             f"Found {tbd_count} urls to be downloaded from {total_count} "
             f"total urls discovered.")
 
+    def _load_priority(self, priority_file):
+        ''' Order the urls to be downloaded by the scores of "analyze.py graph --priority". '''
+        if not os.path.exists(priority_file):
+            self.logger.info(f"Did not find priority file {priority_file}.")
+            return
+        scores = dict()
+        with open(priority_file, encoding="utf-8") as f:
+            for line in f:
+                url, _, score = line.rstrip("\n").rpartition("\t")
+                if url:
+                    scores[normalize(url)] = float(score)
+        self.prioritize(scores)
+        self.logger.info(
+            f"Prioritized urls to be downloaded with {len(scores)} scores "
+            f"from {priority_file}.")
+
+    def prioritize(self, scores):
+        ''' Reorder the urls to be downloaded so higher scores come out first. '''
+        # get_tbd_url pops from the end, so sort ascending. Unscored urls keep
+        # their relative order and go first to the front.
+        self.to_be_downloaded.sort(key=lambda url: scores.get(url, 0.0))
+
+    def _load_templates(self):
+        ''' Restore the learned url templates before is_valid filters the save. '''
+        if not os.path.exists(self.templates_file):
+            return
+        with open(self.templates_file, "rb") as f:
+            load_templates(pickle.load(f))
+        self.logger.info(f"Loaded url templates from {self.templates_file}.")
+
+    def _load_analytics(self):
+        '''
+        Restore the analytics snapshot. It is rewritten every STATE_SAVE_EVERY
+        completions, so after a crash it can miss the last few completed pages;
+        those are not downloaded again, so the gap is logged.
+        '''
+        if not os.path.exists(self.analytics_file):
+            return
+        with open(self.analytics_file, "rb") as f:
+            snapshot = pickle.load(f)
+        if "state" not in snapshot:
+            # Untagged snapshot of an older version: assume nothing is in it.
+            snapshot = {"completed": 0, "state": snapshot}
+        load_analytics_state(snapshot["state"])
+        missing = self.save_completed - snapshot["completed"]
+        if missing > 0:
+            self.logger.warning(
+                f"Crawl analytics in {self.analytics_file} miss up to {missing} "
+                f"urls completed after it was written; they are not in the "
+                f"report nor in OUTPUT. An INDEX built during the crawl can "
+                f"miss more pages: rebuild it from OUTPUT with analyze.py index.")
+        self.logger.info(f"Loaded crawl analytics from {self.analytics_file}.")
+
+    def _load_checkpoint(self):
+        '''
+        Restore the urls to download and the seen urls from the checkpoint
+        of a graceful shutdown, instead of scanning the whole save file.
+        Returns False if there is no usable checkpoint.
+        '''
+        if not os.path.exists(self.checkpoint_file):
+            return False
+        with open(self.checkpoint_file, "rb") as f:
+            state = pickle.load(f)
+        # Any change to the save file from here on makes the checkpoint stale.
+        os.remove(self.checkpoint_file)
+        if (state["save_count"] != len(self.save)
+                or not isinstance(state["seen"], UrlSet)):
+            self.logger.info(
+                f"Checkpoint {self.checkpoint_file} does not match the save "
+                f"file, scanning the save file instead.")
+            return False
+        self.seen = state["seen"]
+        self.to_be_downloaded = state["to_be_downloaded"]
+        self.save_completed = state["save_completed"]
+        self.logger.info(
+            f"Resumed from checkpoint: {len(self.to_be_downloaded)} urls to be "
+            f"downloaded from {len(self.seen)} total urls discovered.")
+        return True
+
+    def _write_pickle(self, path, state):
+        with open(f"{path}.tmp", "wb") as f:
+            pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(f"{path}.tmp", path)
+
+    def stop(self):
+        ''' Stop handing out urls; in-flight downloads can still complete. '''
+        self.stopping = True
+
+    def checkpoint(self):
+        '''
+        Flush all crawl state and close the save file. The urls still to be
+        downloaded (in-flight ones included) and the seen urls go to a
+        checkpoint file so the next run resumes without scanning the save.
+        '''
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.save.sync()
+            flush_crawl_outputs()
+            with self.save_lock:
+                self.save_state()
+            # Held-back urls go first and in-flight urls last, so these are the
+            # first downloaded on resume.
+            to_be_downloaded = (
+                [url for _, url in sorted(self.held)]
+                + self.to_be_downloaded + sorted(self.in_flight))
+            # Checkpoint last: its presence means everything above was written.
+            self._write_pickle(self.checkpoint_file, {
+                "save_count": len(self.save),
+                "save_completed": self.save_completed,
+                "to_be_downloaded": to_be_downloaded,
+                "seen": self.seen,
+            })
+            self.save.close()
+        self.logger.info(
+            f"Checkpointed {len(to_be_downloaded)} urls to be downloaded "
+            f"({len(self.in_flight)} in flight, {len(self.held)} held back) "
+            f"to {self.checkpoint_file}.")
+
+    def save_state(self):
+        '''
+        Write the learned templates, the analytics snapshot and then the
+        crawl output records, so after a crash OUTPUT has at least the pages
+        the snapshot counts. The partial index is only flushed by checkpoint.
+        '''
+        self.save_templates()
+        self.save_analytics()
+        flush_crawl_outputs(index=False)
+
+    def save_templates(self):
+        self._write_pickle(self.templates_file, dump_templates())
+
+    def save_analytics(self):
+        # Read the count first: every url completed by now has its page
+        # counted in the snapshot taken after it.
+        completed = self.save_completed
+        self._write_pickle(self.analytics_file, {
+            "completed": completed, "state": dump_analytics_state()})
+
     def get_tbd_url(self):
-        try:
-            return self.to_be_downloaded.pop()
-        except IndexError:
-            return None
+        ''' Next url to download, or None once none are left (held-back ones included). '''
+        while True:
+            with self.lock:
+                if self.stopping or self.closed:
+                    return None
+                now = time.monotonic()
+                while self.held and self.held[0][0] <= now:
+                    self.to_be_downloaded.append(heapq.heappop(self.held)[1])
+                if self.to_be_downloaded:
+                    url = self.to_be_downloaded.pop()
+                    self.in_flight.add(url)
+                    return url
+                if not self.held:
+                    return None
+                wait = self.held[0][0] - now
+            time.sleep(min(wait, HOLD_POLL_INTERVAL))
+
+    def hold_back(self, url, until):
+        '''
+        Put an in-flight url back to be downloaded at time.monotonic() until,
+        e.g. when its host's robots.txt could not be fetched.
+        '''
+        with self.lock:
+            if self.closed:
+                # Checkpointed as in flight already.
+                return
+            self.in_flight.discard(url)
+            heapq.heappush(self.held, (until, url))
 
     def add_url(self, url):
-        url = normalize(url)
-        urlhash = get_urlhash(url)
-        if urlhash not in self.save:
+        return self.add_urls((url,)) == 1
+
+    def add_urls(self, urls, completed_url=None, hashed=False):
+        '''
+        Add a batch of urls with a single flush of the save file, and return
+        how many of them were new. Duplicates are dropped (within the batch
+        and against self.seen) before anything is written. With hashed=True
+        urls are (url, urlhash) pairs already in frontier form, as returned by
+        scraper.scraper(url, resp, hashed=True). completed_url, if given, is
+        marked complete in the same flush.
+        '''
+        with self.lock:
+            if self.closed:
+                # Worker finishing after the shutdown deadline: its url was
+                # checkpointed as in flight and will be downloaded again.
+                return 0
+            added = self._add_urls(urls, completed_url, hashed)
+        self._after_update()
+        return added
+
+    def _add_urls(self, urls, completed_url, hashed):
+        new_urls = list()
+        for item in urls:
+            if hashed:
+                url, urlhash = item
+            else:
+                url, urlhash = normalize(item), None
+            if self.seen.add(_seen_key(url)):
+                new_urls.append((urlhash or get_urlhash(url), url))
+        for urlhash, url in new_urls:
             self.save[urlhash] = (url, False)
-            self.save.sync()
             self.to_be_downloaded.append(url)
+        if completed_url is not None:
+            self._set_complete(completed_url)
+        if new_urls or completed_url is not None:
+            self.save.sync()
+        if completed_url is not None:
+            self._completed()
+        return len(new_urls)
     
+    def check_robots(self, url):
+        '''
+        True if robots.txt of the url's host allows fetching it, False if it
+        disallows it. None if robots.txt could not be fetched: the url is
+        then held back until robots.txt is retried.
+        '''
+        rules, fetched = self.robots.lookup(url)
+        if rules.unavailable:
+            self.hold_back(url, self.robots.expires_at(url))
+            return None
+        if fetched and self.config.sitemap_limit > 0:
+            self._seed_sitemaps(url, rules)
+        return rules.allowed(url)
+
+    def reserve_fetch(self, url):
+        '''
+        Book the next download slot of the url's host and return how many
+        seconds to wait for it. Slots of one host are POLITENESS (or a longer
+        Crawl-delay) apart, whichever worker takes them.
+        '''
+        delay = max(self.config.time_delay, self.robots.crawl_delay(url))
+        host = urlparse(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_fetch.get(host, now))
+            self.next_fetch[host] = start + delay
+        return start - now
+
+    def _seed_sitemaps(self, url, rules):
+        ''' Add the urls listed in a host's sitemaps, once per host. '''
+        host = urlparse(url).netloc
+        with self.lock:
+            if not rules.sitemaps or host in self.sitemap_hosts:
+                return
+            self.sitemap_hosts.add(host)
+        pending = [
+            s for s in rules.sitemaps
+            if host_allowed(urlparse(s).hostname or "")][:MAX_SITEMAP_FILES]
+        seen_files = set(pending)
+        files = 0
+        added = 0
+        batch = list()
+        while pending and files < MAX_SITEMAP_FILES:
+            sitemap_url = pending.pop(0)
+            files += 1
+            resp = download(sitemap_url, self.config, self.logger)
+            time.sleep(self.config.time_delay)
+            if resp.status != 200 or resp.raw_response is None:
+                continue
+            for kind, loc in iter_sitemap(resp.raw_response.content):
+                if kind == "sitemap":
+                    if (loc not in seen_files
+                            and host_allowed(urlparse(loc).hostname or "")):
+                        seen_files.add(loc)
+                        pending.append(loc)
+                    continue
+                try:
+                    loc = normalize_url(loc)
+                except ValueError:
+                    continue
+                # The sitemap protocol only lists urls of its own host.
+                if (urlparse(loc).netloc == host and is_valid(loc)
+                        and rules.allowed(loc)):
+                    batch.append(loc)
+                    added += 1
+                    if len(batch) >= SITEMAP_BATCH_SIZE:
+                        self.add_urls(batch)
+                        batch = list()
+                    if added >= self.config.sitemap_limit:
+                        pending = list()
+                        break
+        self.add_urls(batch)
+        self.logger.info(
+            f"Seeded {added} urls from {files} sitemaps of {host}.")
+
     def mark_url_complete(self, url):
+        with self.lock:
+            if self.closed:
+                return
+            self._set_complete(url)
+            self.save.sync()
+            self._completed()
+        self._after_update()
+
+    def _set_complete(self, url):
         urlhash = get_urlhash(url)
-        if urlhash not in self.save:
+        if self.seen.add(_seen_key(url)):
             # This should not happen.
             self.logger.error(
                 f"Completed url {url}, but have not seen it before.")
 
         self.save[urlhash] = (url, True)
-        self.save.sync()
+        if url in self.in_flight:
+            self.in_flight.remove(url)
+            self.save_completed += 1
+
+    def _completed(self):
+        self.completed_count += 1
+        if self.completed_count % STATE_SAVE_EVERY == 0:
+            self.save_due = True
+
+    def _after_update(self):
+        ''' Slow upkeep after an update, run without holding self.lock. '''
+        self.seen.merge(self.lock)
+        self._save_if_due()
+
+    def _save_if_due(self):
+        ''' Periodic save_state, run without holding self.lock. '''
+        if not self.save_due or not self.save_lock.acquire(blocking=False):
+            return
+        try:
+            self.save_due = False
+            self.save_state()
+        finally:
+            self.save_lock.release()
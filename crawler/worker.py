@@ -1,21 +1,35 @@
 from threading import Thread
 
+from functools import lru_cache
 from inspect import getsource
 from utils.download import download
 from utils import get_logger
 import scraper
 import time
 
+# A url whose robots.txt lookup or download raised (e.g. the cache server is
+# down) is retried after this many seconds, doubled for each failure in a row
+# of the same worker, up to MAX_RETRY_DELAY.
+RETRY_DELAY = 30
+MAX_RETRY_DELAY = 30 * 60
+
+
+@lru_cache(maxsize=None)
+def check_scraper_source():
+    # basic check for requests in scraper, done once per process
+    source = getsource(scraper)
+    assert {source.find(req) for req in {"from requests import", "import requests"}} == {-1}, "Do not use requests in scraper.py"
+    assert {source.find(req) for req in {"from urllib.request import", "import urllib.request"}} == {-1}, "Do not use urllib.request in scraper.py"
+
 
 class Worker(Thread):
     def __init__(self, worker_id, config, frontier):
         self.logger = get_logger(f"Worker-{worker_id}", "Worker")
         self.config = config
         self.frontier = frontier
-        # basic check for requests in scraper
-        assert {getsource(scraper).find(req) for req in {"from requests import", "import requests"}} == {-1}, "Do not use requests in scraper.py"
-        assert {getsource(scraper).find(req) for req in {"from urllib.request import", "import urllib.request"}} == {-1}, "Do not use urllib.request in scraper.py"
-        super().__init__(daemon=True)
+        check_scraper_source()
+        self.failures = 0
+        super().__init__(daemon=True, name=f"Worker-{worker_id}")
         
     def run(self):
         while True:
@@ -23,12 +37,53 @@ class Worker(Thread):
             if not tbd_url:
                 self.logger.info("Frontier is empty. Stopping Crawler.")
                 break
-            resp = download(tbd_url, self.config, self.logger)
-            self.logger.info(
-                f"Downloaded {tbd_url}, status <{resp.status}>, "
-                f"using cache {self.config.cache_server}.")
-            scraped_urls = scraper.scraper(tbd_url, resp)
-            for scraped_url in scraped_urls:
-                self.frontier.add_url(scraped_url)
+            try:
+                resp = self.fetch(tbd_url)
+            except Exception:
+                # Nothing was downloaded: keep the url and back off.
+                self.failures += 1
+                delay = min(RETRY_DELAY * 2 ** (self.failures - 1), MAX_RETRY_DELAY)
+                self.logger.exception(
+                    f"Failed to download {tbd_url}, retrying it in {delay}s.")
+                self.frontier.hold_back(tbd_url, time.monotonic() + delay)
+                continue
+            self.failures = 0
+            if resp is None:
+                continue
+            try:
+                self.process(tbd_url, resp)
+            except Exception:
+                # A page that breaks the scraper would break it again: skip it.
+                self.logger.exception(f"Failed to process {tbd_url}, skipping it.")
+                self.frontier.mark_url_complete(tbd_url)
+
+    def fetch(self, tbd_url):
+        ''' Download tbd_url, or return None if it is skipped or held back. '''
+        allowed = self.frontier.check_robots(tbd_url)
+        if allowed is None:
+            # robots.txt could not be fetched: the frontier retries the url later.
+            self.logger.info(f"Holding back {tbd_url}, robots.txt unavailable.")
+            return None
+        if not allowed:
+            self.logger.info(f"Skipping {tbd_url}, disallowed by robots.txt.")
+            self.frontier.mark_url_complete(tbd_url)
+            return None
+        if not scraper.template_allows(tbd_url):
+            # Queued before its url template was found to be a trap.
+            self.logger.info(f"Skipping {tbd_url}, low-yield url template.")
             self.frontier.mark_url_complete(tbd_url)
-            time.sleep(self.config.time_delay)
+            return None
+        # Wait for the host's next free slot (shared by all workers).
+        time.sleep(self.frontier.reserve_fetch(tbd_url))
+        resp = download(tbd_url, self.config, self.logger)
+        self.logger.info(
+            f"Downloaded {tbd_url}, status <{resp.status}>, "
+            f"using cache {self.config.cache_server}.")
+        return resp
+
+    def process(self, tbd_url, resp):
+        scraped_urls = scraper.scraper(tbd_url, resp, hashed=True)
+        new_urls = self.frontier.add_urls(
+            scraped_urls, completed_url=tbd_url, hashed=True)
+        scraper.record_template_outlinks(tbd_url, len(scraped_urls), new_urls)
+        time.sleep(self.config.time_delay)
@@ -2,19 +2,27 @@ from imports import *
 
 # ---------------- THREAD-SAFE ANALYTICS ----------------
 
-_ANALYTICS_LOCK = threading.Lock()
-_VARIANTS_LOCK = threading.Lock()
+# Named so the profiler can report how long workers wait on each of them
+_ANALYTICS_LOCK = TimedLock("analytics")
+_VARIANTS_LOCK = TimedLock("variants")
+_TEMPLATES_LOCK = TimedLock("templates")
 
-UNIQUE_PAGES = set()                 # canonical URL strings
+UNIQUE_PAGES = UrlSet()              # canonical URLs (compact set, see utils/urlstore.py)
 LONGEST_PAGE_URL = None
 LONGEST_PAGE_WORDS = 0
 
 WORD_FREQ = Counter()                # non-stopword tokens
 STOPWORD_FREQ = Counter()            # stopword tokens (what you asked for)
-SUBDOMAIN_PAGES = defaultdict(set)   # host -> set(canonical urls)
+SUBDOMAIN_PAGES = Counter()          # host -> number of unique pages
 
 PATH_QUERY_SEEN = defaultdict(set)   # (netloc, path) -> set(queries)
 
+URL_TEMPLATES = OrderedDict()        # template -> array of TEMPLATE_FIELDS counters (LRU order)
+CONTENT_HASHES = array("Q", bytes(8 * CONTENT_HASH_SLOTS))  # bounded digest table, 0 = empty
+
+CRAWL_OUTPUT = None                  # optional CrawlWriter, see open_crawl_output()
+INDEX_BUILDER = None                 # optional IndexBuilder, see open_index()
+
 
 BAD_URLS = set()
 
@@ -39,28 +47,119 @@ def is_bad_url(url: str) -> bool:
 
 # ---------------- UTILS ----------------
 
-def to_text(content):
+# Byte order marks, longest first (the UTF-32 LE mark starts with the UTF-16 LE one).
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+# Text codecs that do not decode web pages: labels naming them are ignored
+_NON_PAGE_CODECS = frozenset((
+    "undefined", "idna", "punycode", "unicode-escape", "raw-unicode-escape"))
+_HEADER_CHARSET = re.compile(r"charset\s*=\s*[\"']?\s*([\w.:-]+)", re.I)
+_META_CHARSET = re.compile(rb"<meta[^>]+charset\s*=\s*[\"']?\s*([\w.:-]+)", re.I)
+
+
+def _lookup_encoding(label):
+    """
+    Map a declared charset label to a Python codec name, or None if it does
+    not name a text encoding. Like browsers, Latin-1 and ASCII labels are
+    read as windows-1252.
+    """
+    try:
+        info = codecs.lookup(label)
+    except (LookupError, TypeError):
+        # Unknown or garbled label: ignore the declaration
+        return None
+    name = info.name
+    # codecs.lookup also finds bytes-to-bytes codecs (hex, base64, zlib, ...)
+    if not info._is_text_encoding or name in _NON_PAGE_CODECS:
+        return None
+    # windows-1252 is a superset that also covers the 0x80-0x9F punctuation
+    if name in ("latin-1", "iso8859-1", "ascii"):
+        return "cp1252"
+    return name
+
+
+def detect_encoding(content, content_type=""):
+    """
+    Pick the codec of an HTML body: BOM, then the Content-Type charset,
+    then a <meta charset> in the first ENCODING_SNIFF_BYTES bytes.
+    Undeclared bodies are UTF-8 if they decode as such, else FALLBACK_ENCODING.
+    """
+    # A byte order mark beats any declaration
+    for bom, encoding in _BOMS:
+        if content.startswith(bom):
+            return encoding
+    # Charset parameter of the Content-Type header
+    match = _HEADER_CHARSET.search(content_type or "")
+    encoding = _lookup_encoding(match.group(1)) if match else None
+    if encoding:
+        return encoding
+    # <meta charset="..."> or <meta http-equiv="Content-Type" content="...; charset=...">
+    match = _META_CHARSET.search(content, 0, ENCODING_SNIFF_BYTES)
+    encoding = _lookup_encoding(match.group(1).decode("ascii")) if match else None
+    # A meta tag that we could read as ASCII cannot really be UTF-16
+    if encoding and encoding.startswith("utf-16"):
+        encoding = "utf-8"
+    if encoding:
+        return encoding
+    # Nothing declared: valid UTF-8 is almost certainly UTF-8
+    try:
+        content.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError:
+        return FALLBACK_ENCODING
+
+
+def to_text(content, encoding=None, content_type=""):
     """
     Convert raw response content into a Python string.
     Handles None, bytes, and already-string-like content.
+    Bytes are decoded with encoding, or the one detect_encoding() picks.
     """
     # If content is missing, return empty string
     if content is None:
         return ""
-    # If content is bytes, decode as UTF-8 (ignore bad byte sequences)
+    # If content is bytes, decode with the detected charset
     if isinstance(content, bytes):
-        return content.decode("utf-8", errors="ignore")
+        encoding = encoding or detect_encoding(content, content_type)
+        try:
+            # Undecodable bytes become U+FFFD, which splits tokens instead of gluing them
+            return content.decode(encoding, errors="replace")
+        except (LookupError, UnicodeError):
+            # A codec that cannot decode pages at all: fall back like undeclared bodies
+            return content.decode(FALLBACK_ENCODING, errors="replace")
     # Otherwise, coerce to string
     return str(content)
 
 
-def extract_visible_text(html):
+def response_text(resp):
     """
-    Extract visible human-readable text from HTML by removing
-    common non-content tags (scripts, nav, etc.) and returning the text.
+    Decoded HTML of a response, decoded once and cached on the response.
     """
-    # Parse HTML into a BeautifulSoup DOM
-    soup = BeautifulSoup(html, "html.parser")
+    # Reuse the text if this response was already decoded
+    text = getattr(resp, "_decoded_text", None)
+    if text is None:
+        raw = resp.raw_response
+        # Charset declared by the server, if any
+        content_type = raw.headers.get("Content-Type") or ""
+        text = resp._decoded_text = to_text(raw.content, content_type=content_type)
+    return text
+
+
+def make_soup(html):
+    """
+    Parse HTML into a BeautifulSoup DOM.
+    bs4 is imported on first use so importing the crawler stays fast.
+    """
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(html, "html.parser")
+
+
+def _visible_text(soup):
     # Remove tags that usually contain non-visible or repeated boilerplate content
     for tag in soup(["script", "style", "noscript", "header", "footer", "nav", "aside"]):
         # Delete the entire tag subtree from the DOM
@@ -69,6 +168,31 @@ def extract_visible_text(html):
     return soup.get_text(separator=" ", strip=True)
 
 
+def extract_visible_text(html):
+    """
+    Extract visible human-readable text from HTML by removing
+    common non-content tags (scripts, nav, etc.) and returning the text.
+    """
+    # Parse HTML into a BeautifulSoup DOM
+    return _visible_text(make_soup(html))
+
+
+def parse_response(resp):
+    """
+    Parse a response's HTML once and cache (visible text, raw hrefs) on it,
+    so the scraper and link extraction share a single decode and parse.
+    """
+    # Reuse the parse if this response was already handled
+    parsed = getattr(resp, "_parsed_page", None)
+    if parsed is None:
+        # Parse HTML into a BeautifulSoup DOM
+        soup = make_soup(response_text(resp))
+        # Collect hrefs first: nav/header/footer links are dropped from the text below
+        hrefs = [a["href"] for a in soup.find_all("a", href=True)]
+        parsed = resp._parsed_page = (_visible_text(soup), hrefs)
+    return parsed
+
+
 def tokenize(text_content: str) -> list[str]:
     """
     Returns tokens EXCLUDING stopwords and digits.
@@ -264,9 +388,206 @@ def too_many_variants(url: str) -> bool:
         return len(PATH_QUERY_SEEN[key]) > MAX_VARIANTS_PER_PATH
 
 
+# ---------------- LEARNED TRAP DETECTION ----------------
+
+# Counters kept per URL template, in this order.
+TEMPLATE_FIELDS = ("fetched", "new_pages", "thin", "duplicate", "outlinks", "new_outlinks")
+
+_DATE_IN_SEGMENT = re.compile(r"(19|20)\d\d[-_/]?\d\d[-_/]?\d\d")
+_DATE_SEGMENT = re.compile(r"^(19|20)\d\d([-_]?\d\d){0,2}$")
+_NUMBER_SEGMENT = re.compile(r"^\d+$")
+_ID_SEGMENT = re.compile(r"^(?=.*\d)([0-9a-f-]{8,}|[a-z0-9_-]{20,})$")
+
+
+def _template_part(part: str) -> str:
+    """
+    Placeholder for a numeric, date or id-like path segment or query value;
+    other parts are kept (with dates embedded in them collapsed).
+    """
+    if _DATE_SEGMENT.match(part):
+        return "{date}"
+    if _NUMBER_SEGMENT.match(part):
+        return "{n}"
+    if _ID_SEGMENT.match(part):
+        return "{id}"
+    # Dates embedded in a longer part (e.g. "day-2019-01-05")
+    return _DATE_IN_SEGMENT.sub("{date}", part)
+
+
+def url_template(url: str) -> str:
+    """
+    Collapse a URL into its template: numeric, date and id-like path segments
+    and query values become placeholders, other values are kept (query pairs sorted).
+    e.g. https://x.uci.edu/events/2019-01-05/42?a=1&id=x -> x.uci.edu/events/{date}/{n}?a={n}&id=x
+    """
+    # Split URL so we can rewrite path segments and query values separately
+    s = urlsplit(url)
+    segments = []
+    for seg in s.path.lower().split("/"):
+        # Skip empty segments so trailing slashes don't create new templates
+        if not seg:
+            continue
+        segments.append(_template_part(seg))
+
+    # Query values follow the path rules, so ?id=page_name stays distinct from ?id=other
+    pairs = sorted({
+        f"{k.lower()}={_template_part(v.lower())}"
+        for k, v in parse_qsl(s.query, keep_blank_values=True)})
+    template = s.netloc.lower() + "/" + "/".join(segments)
+    if pairs:
+        template += "?" + "&".join(pairs)
+    return template
+
+
+def _template_stats(template: str):
+    """
+    Return the counters for template, creating them if needed.
+    Caller must hold _TEMPLATES_LOCK.
+    """
+    stats = URL_TEMPLATES.get(template)
+    if stats is None:
+        # New template: evict the least recently used one if the table is full
+        if len(URL_TEMPLATES) >= MAX_TEMPLATES:
+            URL_TEMPLATES.popitem(last=False)
+        stats = URL_TEMPLATES[template] = array("I", [0] * len(TEMPLATE_FIELDS))
+    else:
+        # Mark as recently used so active templates are never evicted
+        URL_TEMPLATES.move_to_end(template)
+    return stats
+
+
+def template_yield(stats) -> float:
+    """
+    Score in [0, 1] of how useful fetching a template has been:
+    mostly the fraction of fetches that produced a new, non-thin, non-duplicate
+    page, plus the fraction of its outlinks that were new to the frontier.
+    """
+    fetched, new_pages, _, _, outlinks, new_outlinks = stats
+    # Nothing fetched yet: assume the template is fine
+    if not fetched:
+        return 1.0
+    page_yield = new_pages / fetched
+    link_yield = new_outlinks / outlinks if outlinks else 0.0
+    return 0.7 * page_yield + 0.3 * link_yield
+
+
+def record_template_fetch(url: str, outcome: str) -> None:
+    """
+    Record the outcome of fetching url against its template.
+    outcome is one of "new", "seen", "thin", "duplicate" or "failed".
+    """
+    template = url_template(url)
+    with _TEMPLATES_LOCK:
+        stats = _template_stats(template)
+        # Every outcome counts as a fetch; only "new" counts as a useful page
+        stats[0] += 1
+        if outcome == "new":
+            stats[1] += 1
+        elif outcome == "thin":
+            stats[2] += 1
+        elif outcome == "duplicate":
+            stats[3] += 1
+
+
+def record_template_outlinks(url: str, total: int, new: int) -> None:
+    """
+    Record how many of the outlinks found on url were new to the frontier.
+    """
+    template = url_template(url)
+    with _TEMPLATES_LOCK:
+        stats = _template_stats(template)
+        stats[4] += total
+        stats[5] += new
+
+
+def template_allows(url: str) -> bool:
+    """
+    Return False if url belongs to a template whose yield has dropped
+    below TEMPLATE_BLOCK_YIELD. Templates below TEMPLATE_THROTTLE_YIELD only
+    let a deterministic 1 in TEMPLATE_THROTTLE_RATE of their URLs through.
+    """
+    template = url_template(url)
+    with _TEMPLATES_LOCK:
+        stats = URL_TEMPLATES.get(template)
+        # Unknown or not yet judged templates are always allowed
+        if stats is None or stats[0] < TEMPLATE_MIN_FETCHES:
+            return True
+        URL_TEMPLATES.move_to_end(template)
+        score = template_yield(stats)
+
+    if score < TEMPLATE_BLOCK_YIELD:
+        return False
+    if score < TEMPLATE_THROTTLE_YIELD:
+        # crc32 (unlike hash()) gives the same decision across runs
+        return zlib.crc32(url.encode("utf-8")) % TEMPLATE_THROTTLE_RATE == 0
+    return True
+
+
+def content_digest(text: str) -> int:
+    """
+    64-bit digest of a page's visible text.
+    """
+    # 8-byte digest keeps sets small; collisions are negligible at crawl scale
+    return int.from_bytes(
+        hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def is_duplicate_content(digest: int) -> bool:
+    """
+    Return True if a page with the same content_digest() was already seen.
+    Digests live in a fixed-size table of CONTENT_HASH_WAYS-slot buckets, so
+    memory stays bounded; a full bucket forgets its oldest digest.
+    """
+    # 0 marks an empty slot
+    digest = digest or 1
+    start = digest % (CONTENT_HASH_SLOTS // CONTENT_HASH_WAYS) * CONTENT_HASH_WAYS
+    end = start + CONTENT_HASH_WAYS
+    with _TEMPLATES_LOCK:
+        bucket = CONTENT_HASHES[start:end]
+        if digest in bucket:
+            return True
+        # Shift out the oldest (or an empty) slot and append the new digest
+        bucket.pop(0)
+        bucket.append(digest)
+        CONTENT_HASHES[start:end] = bucket
+        return False
+
+
+def dump_templates():
+    """
+    Snapshot of the learned template table (picklable) for the frontier to persist.
+    """
+    with _TEMPLATES_LOCK:
+        return {
+            "templates": [(t, bytes(s)) for t, s in URL_TEMPLATES.items()],
+            "content_hashes": CONTENT_HASHES.tobytes(),
+        }
+
+
+def load_templates(state) -> None:
+    """
+    Restore a snapshot produced by dump_templates().
+    """
+    with _TEMPLATES_LOCK:
+        URL_TEMPLATES.clear()
+        for template, raw in state.get("templates", ()):
+            stats = array("I")
+            stats.frombytes(raw)
+            URL_TEMPLATES[template] = stats
+        hashes = state.get("content_hashes", b"")
+        if isinstance(hashes, bytes) and len(hashes) == 8 * CONTENT_HASH_SLOTS:
+            CONTENT_HASHES[:] = array("Q", hashes)
+        else:
+            # Missing, older format or another table size: start a fresh table
+            CONTENT_HASHES[:] = array("Q", bytes(8 * CONTENT_HASH_SLOTS))
+
+
 # ---------------- ANALYTICS ----------------
 
-def update_analytics(url: str, text: str):
+# Set version of STOP_WORDS for per-token membership tests
+_STOP_WORD_SET = frozenset(STOP_WORDS)
+
+def update_analytics(url: str, text: str, all_tokens=None) -> bool:
     """
     Updates:
       1) UNIQUE_PAGES count
@@ -274,86 +595,173 @@ def update_analytics(url: str, text: str):
       3) top content words (non-stopwords)
       4) top stopwords
       5) subdomain counts under uci.edu
+    all_tokens can pass in tokenize_with_stopwords(text) if the caller already has it.
+    Returns True if the page was not counted before.
     """
     global LONGEST_PAGE_URL, LONGEST_PAGE_WORDS
 
     # Canonicalize URL for counting unique pages
     canon = canonicalize_for_count(url)
-    # Parse canonical URL to extract host information
-    parsed = urlparse(canon)
-    # Normalize host to lowercase; avoid None
-    host = parsed.hostname.lower() or ""
-
-    # For subdomain reporting, treat www.* as the same subdomain
-    if host.startswith("www."):
-        host = host[4:]
+    # Host for subdomain reporting (lowercased, www.* folded into its subdomain)
+    host = report_host(canon)
 
-    # Tokens excluding stopwords (for "top content words")
-    content_tokens = tokenize(text)
-    # Tokens including stopwords (for longest page + stopword frequency)
-    all_tokens = tokenize_with_stopwords(text)
+    # Tokens including stopwords (for longest page, stopword and content word frequency)
+    if all_tokens is None:
+        all_tokens = tokenize_with_stopwords(text)
     # Word count is token count including stopwords (excluding pure digits)
     word_count = len(all_tokens)
 
     # Lock analytics so updates are thread-safe and UNIQUE_PAGES behaves correctly
     with _ANALYTICS_LOCK:
-        # If we already counted this canonical URL, don't double-count or re-add frequencies
-        if canon in UNIQUE_PAGES:
-            return
-
-        # Record this page as unique
-        UNIQUE_PAGES.add(canon)
+        # Record this page as unique; if we already counted it, don't double-count or re-add frequencies
+        if not UNIQUE_PAGES.add(canon):
+            return False
 
         # Update longest page tracking if this page is bigger
         if word_count > LONGEST_PAGE_WORDS:
             LONGEST_PAGE_WORDS = word_count
             LONGEST_PAGE_URL = canon
 
-        # content words
-        for t in content_tokens:
-            # Ignore very short tokens and domain-noise words
-            if len(t) >= 2 and t not in DOMAIN_STOP_WORDS:
-                # Increment frequency for content word reporting
-                WORD_FREQ[t] += 1
-
-        # stopwords
+        # One pass over the tokens: stopwords, then content words (what tokenize() keeps)
         for t in all_tokens:
-            # Only count if token is in STOP_WORDS list
-            if t in STOP_WORDS:
+            if t in _STOP_WORD_SET:
                 # Increment stopword frequency
                 STOPWORD_FREQ[t] += 1
+            # Ignore very short tokens and domain-noise words
+            elif len(t) >= 2 and t not in DOMAIN_STOP_WORDS:
+                # Increment frequency for content word reporting
+                WORD_FREQ[t] += 1
 
         # uci.edu subdomains
         if host.endswith(".uci.edu") and host != "uci.edu":
-            # Track which unique pages were found under each subdomain
-            SUBDOMAIN_PAGES[host].add(canon)
+            # Count unique pages per subdomain (canon is new, so this never double-counts)
+            SUBDOMAIN_PAGES[host] += 1
+
+    # Merge UNIQUE_PAGES runs without holding the analytics lock
+    UNIQUE_PAGES.merge(_ANALYTICS_LOCK)
+    return True
+
+
+def report_host(canon: str) -> str:
+    """
+    Host used for subdomain reporting: lowercased, with www. stripped.
+    """
+    host = (urlparse(canon).hostname or "").lower()
+    # For subdomain reporting, treat www.* as the same subdomain
+    return host[4:] if host.startswith("www.") else host
+
+
+def open_crawl_output(directory: str, restart: bool = False) -> None:
+    """
+    Start streaming per-page records to directory (see utils/crawl_output.py).
+    The writer is flushed automatically at exit.
+    """
+    global CRAWL_OUTPUT
+    CRAWL_OUTPUT = CrawlWriter(directory, restart)
+    atexit.register(CRAWL_OUTPUT.close)
+
+
+def record_crawl_output(url: str, status: int, unique: bool = False, all_tokens=None,
+                        digest: int = 0, outlinks=()) -> None:
+    """
+    Append one page record to the crawl output, if it is enabled.
+    all_tokens are the page's tokenize_with_stopwords() tokens.
+    """
+    # Crawl output is optional: nothing to do unless open_crawl_output() was called
+    if CRAWL_OUTPUT is None:
+        return
+    # Same canonical form and host as update_analytics, so reports can be rebuilt offline
+    canon = canonicalize_for_count(url)
+    tokens = all_tokens or ()
+    CRAWL_OUTPUT.write_page(
+        canon, report_host(canon), status, unique=unique, word_count=len(tokens),
+        content_hash=digest, outlinks=outlinks, token_counts=Counter(tokens))
+
+
+def open_index(directory: str, restart: bool = False) -> None:
+    """
+    Start building an inverted index of unique pages in directory (see utils/index.py).
+    Partial indexes are merged into the final index at exit.
+    """
+    global INDEX_BUILDER
+    INDEX_BUILDER = IndexBuilder(directory, restart)
+    atexit.register(INDEX_BUILDER.finish)
+
+
+def index_page(url: str, all_tokens) -> None:
+    """
+    Add a unique page to the inverted index, if indexing is enabled.
+    all_tokens are the page's tokenize_with_stopwords() tokens.
+    """
+    # Indexing is optional: nothing to do unless open_index() was called
+    if INDEX_BUILDER is None:
+        return
+    INDEX_BUILDER.add_document(canonicalize_for_count(url), Counter(all_tokens))
+
+
+def flush_crawl_outputs(index: bool = True) -> None:
+    """
+    Write buffered crawl output records and partial index runs to disk.
+    index=False leaves the partial index in memory (every flush adds a run file to merge).
+    """
+    if CRAWL_OUTPUT is not None:
+        CRAWL_OUTPUT.flush()
+    if index and INDEX_BUILDER is not None:
+        INDEX_BUILDER.flush()
+
+
+def dump_analytics_state():
+    """
+    Snapshot of the analytics and trap-detection state (picklable), so a
+    resumed crawl keeps counting where this one stopped.
+    """
+    with _ANALYTICS_LOCK, _VARIANTS_LOCK:
+        return {
+            "unique_pages": UNIQUE_PAGES.copy(),
+            "longest_page": (LONGEST_PAGE_URL, LONGEST_PAGE_WORDS),
+            "word_freq": Counter(WORD_FREQ),
+            "stopword_freq": Counter(STOPWORD_FREQ),
+            "subdomain_pages": Counter(SUBDOMAIN_PAGES),
+            "path_query_seen": {k: set(q) for k, q in PATH_QUERY_SEEN.items()},
+            "bad_urls": set(BAD_URLS),
+        }
+
+
+def load_analytics_state(state) -> None:
+    """
+    Restore a snapshot produced by dump_analytics_state().
+    """
+    global LONGEST_PAGE_URL, LONGEST_PAGE_WORDS
+    with _ANALYTICS_LOCK, _VARIANTS_LOCK:
+        UNIQUE_PAGES.clear()
+        UNIQUE_PAGES.update(state["unique_pages"])
+        LONGEST_PAGE_URL, LONGEST_PAGE_WORDS = state["longest_page"]
+        WORD_FREQ.clear()
+        WORD_FREQ.update(state["word_freq"])
+        STOPWORD_FREQ.clear()
+        STOPWORD_FREQ.update(state["stopword_freq"])
+        SUBDOMAIN_PAGES.clear()
+        # Older snapshots kept the set of pages of each subdomain
+        SUBDOMAIN_PAGES.update({
+            h: p if isinstance(p, int) else len(p)
+            for h, p in state["subdomain_pages"].items()})
+        PATH_QUERY_SEEN.clear()
+        PATH_QUERY_SEEN.update(state["path_query_seen"])
+        BAD_URLS.clear()
+        BAD_URLS.update(state["bad_urls"])
 
 
 def dump_analytics():
     """
     Write crawl analytics summary to crawl_analytics.txt at program exit.
     """
-    # Open output file for writing (overwrites prior run)
-    with open("crawl_analytics.txt", "w") as f:
-        # Write unique page count
-        f.write(f"Unique pages: {len(UNIQUE_PAGES)}\n")
-        # Write longest page info
-        f.write(f"Longest page ({LONGEST_PAGE_WORDS} words):\n{LONGEST_PAGE_URL}\n\n")
-
-        # Write most common content words (non-stopwords)
-        f.write("Top 50 content words (non-stopwords):\n")
-        for w, c in WORD_FREQ.most_common(50):
-            f.write(f"{w}, {c}\n")
-
-        # Write most common stopwords
-        f.write("\nTop 50 stopwords:\n")
-        for w, c in STOPWORD_FREQ.most_common(50):
-            f.write(f"{w}, {c}\n")
-
-        # Write subdomain list and page counts per subdomain
-        f.write("\nSubdomains under uci.edu:\n")
-        for sd in sorted(SUBDOMAIN_PAGES):
-            f.write(f"{sd}, {len(SUBDOMAIN_PAGES[sd])}\n")
+    # Nothing crawled in this process (e.g. a dry run): keep any previous report
+    if not UNIQUE_PAGES:
+        return
+    # Same report format as the offline rebuild in analyze.py (overwrites prior run)
+    write_analytics_report(
+        "crawl_analytics.txt", len(UNIQUE_PAGES), LONGEST_PAGE_WORDS, LONGEST_PAGE_URL,
+        WORD_FREQ, STOPWORD_FREQ, SUBDOMAIN_PAGES)
 
 
 # Register analytics dump so it runs automatically when the process exits normally
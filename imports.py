@@ -1,12 +1,20 @@
 import re
+import zlib
+import codecs
+import hashlib
 import atexit
 import threading
+from array import array
 from urllib.parse import (
     urlparse, urljoin, urldefrag, urlsplit, urlunsplit,
     parse_qsl, urlencode
 )
-from collections import defaultdict, Counter
-from bs4 import BeautifulSoup
+from collections import defaultdict, Counter, OrderedDict
+from utils.crawl_output import CrawlWriter
+from utils.analytics_report import write_analytics_report
+from utils.index import IndexBuilder
+from utils.profiler import TimedLock
+from utils.urlstore import UrlSet
 
 
 STOP_WORDS = [
@@ -62,3 +70,16 @@ MIN_WORDS = 50
 MAX_PARAMS = 6
 MAX_QUERY_LEN = 120
 MAX_VARIANTS_PER_PATH = 20
+
+# Learned trap detection (per URL template yield statistics)
+MAX_TEMPLATES = 50000           # templates kept in memory (least recently used dropped)
+TEMPLATE_MIN_FETCHES = 20       # fetches before a template's yield is trusted
+TEMPLATE_THROTTLE_YIELD = 0.3   # below this, only 1 in TEMPLATE_THROTTLE_RATE urls is kept
+TEMPLATE_BLOCK_YIELD = 0.1      # below this, the template is not crawled anymore
+TEMPLATE_THROTTLE_RATE = 4
+CONTENT_HASH_SLOTS = 1 << 20    # page digests remembered for duplicate detection (8 MiB)
+CONTENT_HASH_WAYS = 4           # slots per bucket; a full bucket forgets its oldest digest
+
+# Response decoding
+ENCODING_SNIFF_BYTES = 4096     # how far into the body to look for <meta charset>
+FALLBACK_ENCODING = "cp1252"    # undeclared bodies that are not valid UTF-8
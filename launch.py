@@ -1,15 +1,30 @@
+import time
+_START = time.perf_counter()
+
 from configparser import ConfigParser
 from argparse import ArgumentParser
 
-from utils.server_registration import get_cache_server
+from utils.server_registration import get_cache_server, parse_cache_server
 from utils.config import Config
 from crawler import Crawler
+from crawler.worker import check_scraper_source
 
 
-def main(config_file, restart):
+def main(config_file, restart, cache_server=None, dry_run=False):
     cparser = ConfigParser()
     cparser.read(config_file)
     config = Config(cparser)
+    if cache_server:
+        config.cache_server_override = cache_server
+    if dry_run:
+        # Validate config and scraper only: no registration, no crawling.
+        if config.cache_server_override:
+            parse_cache_server(config.cache_server_override)
+        check_scraper_source()
+        print(
+            f"Dry run OK, started in "
+            f"{(time.perf_counter() - _START) * 1000:.1f} ms.")
+        return
     config.cache_server = get_cache_server(config, restart)
     crawler = Crawler(config, restart)
     crawler.start()
@@ -19,5 +34,7 @@ if __name__ == "__main__":
     parser = ArgumentParser()
     parser.add_argument("--restart", action="store_true", default=False)
     parser.add_argument("--config_file", type=str, default="config.ini")
+    parser.add_argument("--cache_server", type=str, default=None)
+    parser.add_argument("--dry_run", action="store_true", default=False)
     args = parser.parse_args()
-    main(args.config_file, args.restart)
+    main(args.config_file, args.restart, args.cache_server, args.dry_run)
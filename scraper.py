@@ -1,10 +1,14 @@
 from helpers import *  # import crawler utilities: parsing, normalization, trap checks, analytics, etc.
+from utils import get_urlhash, normalize  # the frontier's url form and key, for the hashed fast path
 
 
-def scraper(url, resp):
+def scraper(url, resp, hashed=False):
     """
     Main scraping entrypoint called by the crawler worker.
 
+    With hashed=True the links are returned as (url, urlhash) pairs already in
+    the frontier's normal form, ready for Frontier.add_urls(..., hashed=True).
+
     Responsibilities:
       - Validate the response (status/content/type)
       - Extract visible text and enforce minimum word threshold
@@ -34,11 +38,16 @@ def scraper(url, resp):
         except Exception:
             # If anything goes wrong while marking bad, just ignore and move on.
             pass
+        # A fetch that produced nothing still counts against the URL's template.
+        record_template_fetch(url, "failed")
+        record_crawl_output(resp.url or url, status)
         # Do not extract text or links from bad responses.
         return []
 
     # If it’s not a 200 OK, or there’s no body content, stop.
     if status != 200 or resp.raw_response.content is None:
+        record_template_fetch(url, "failed")
+        record_crawl_output(resp.url or url, status)
         return []
     
     # Attempt to read the Content-Type header to ensure we're only processing HTML pages.
@@ -52,20 +61,31 @@ def scraper(url, resp):
 
     # If Content-Type exists and it isn't HTML, skip it (e.g., PDF, images, etc.).
     if content_type and "text/html" not in content_type:
+        record_template_fetch(url, "failed")
+        record_crawl_output(resp.url or url, status)
         return []
 
-    # Convert raw bytes -> string HTML.
-    html = to_text(resp.raw_response.content)
-    # Strip scripts/styles/nav/etc and get visible text only.
-    text = extract_visible_text(html)
+    # Decode (charset from header/BOM/meta) and parse once; visible text only, no scripts/styles/nav/etc.
+    text, _ = parse_response(resp)
 
     # Enforce minimum content threshold (prevents indexing near-empty boilerplate pages).
     # tokenize_with_stopwords counts "word-like" tokens (excluding pure digits).
-    if len(tokenize_with_stopwords(text)) < MIN_WORDS:
+    all_tokens = tokenize_with_stopwords(text)
+    if len(all_tokens) < MIN_WORDS:
+        record_template_fetch(url, "thin")
+        record_crawl_output(resp.url or url, status, all_tokens=all_tokens)
         return []
 
+    # Exact duplicate of a page we already saw under another URL?
+    digest = content_digest(text)
+    duplicate = is_duplicate_content(digest)
     # Record analytics (unique page count, longest page, word/stopword frequencies, subdomains).
-    update_analytics(resp.url, text)
+    is_new = update_analytics(resp.url, text, all_tokens)
+    # Add newly counted pages to the optional inverted index.
+    if is_new:
+        index_page(resp.url, all_tokens)
+    # Feed the outcome into the learned per-template yield statistics.
+    record_template_fetch(url, "duplicate" if duplicate else "new" if is_new else "seen")
 
     # Collect valid outgoing links.
     links = []
@@ -76,6 +96,17 @@ def scraper(url, resp):
         # Only keep the link if it passes validity/trap checks.
         if is_valid(n):
             links.append(n)
+    # Stream the page (with its outlinks) to the optional columnar crawl output.
+    record_crawl_output(
+        resp.url, status, unique=is_new, all_tokens=all_tokens, digest=digest, outlinks=links)
+    if hashed:
+        # Fast path for the frontier: apply its normalize/hash once here, deduped.
+        frontier_links = {}
+        for n in links:
+            n = normalize(n)
+            if n not in frontier_links:
+                frontier_links[n] = get_urlhash(n)
+        return list(frontier_links.items())
     # Return all valid links to add to the crawl frontier.
     return links
 
@@ -88,17 +119,15 @@ def extract_next_links(url, resp):
       A list of defragmented (fragment removed) absolute URLs.
       (No validity filtering happens here; that is done in is_valid().)
     """
-    # Convert raw bytes -> string HTML.
-    html = to_text(resp.raw_response.content)
-    # Parse HTML to find <a href="..."> links.
-    soup = BeautifulSoup(html, "html.parser")
+    # <a href="..."> values, from the parse shared with scraper() (decoded and parsed once per response).
+    _, hrefs = parse_response(resp)
     # Use a set to deduplicate links found on this page.
     found = set()
 
-    # Iterate all anchor tags that have an href attribute.
-    for a in soup.find_all("a", href=True):
-        # Pull and trim the href value.
-        href = a["href"].strip()
+    # Iterate all anchor tag hrefs.
+    for href in hrefs:
+        # Trim the href value.
+        href = href.strip()
         # Skip empty hrefs and non-web link schemes we don't want to crawl.
         if not href or href.startswith(("mailto:", "javascript:", "tel:")):
             continue
@@ -128,6 +157,7 @@ def is_valid(url):
       - path/query trap checks
       - query-variant explosion checks
       - special-case trap rules for event calendars and doku.php
+      - learned URL templates whose crawl yield is too low
       - reject unwanted file extensions
     """
     try:
@@ -159,6 +189,10 @@ def is_valid(url):
         if too_many_variants(url):
             return False
 
+        # Reject (or thin out) URL templates that have proven to be low-yield traps.
+        if not template_allows(n):
+            return False
+
         # Work with lowercased path for consistent substring checks.
         path = parsed.path.lower()
 
@@ -0,0 +1,140 @@
+import os
+import sys
+import pickle
+import threading
+from collections import Counter
+from configparser import ConfigParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError
+from urllib.parse import urlsplit
+from urllib.request import Request, urlopen
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.config import Config
+from utils.response import Response
+
+
+class RawResponse(object):
+    ''' The parts of a requests.Response the crawler reads. '''
+
+    def __init__(self, content, headers):
+        self.content = content
+        self.headers = headers
+
+
+class StandInServer(object):
+    '''
+    Local HTTP server standing in for the cache server and the sites behind
+    it: pages maps (host, path with query) to (status, body, content type),
+    and download() has the signature of utils.download.download.
+    '''
+
+    def __init__(self):
+        self.pages = dict()
+        self.requests = list()
+        pages, requests = self.pages, self.requests
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                key = (self.headers["X-Host"], self.path)
+                requests.append(key)
+                status, body, content_type = pages.get(
+                    key, (404, b"", "text/plain"))
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def add(self, url, body, status=200, content_type="text/html"):
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.pages[(parts.netloc, path)] = (status, body, content_type)
+
+    def download(self, url, config, logger=None):
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        host, port = self.server.server_address
+        request = Request(
+            f"http://{host}:{port}{path}", headers={"X-Host": parts.netloc})
+        try:
+            with urlopen(request) as resp:
+                status, content, headers = resp.status, resp.read(), resp.headers
+        except HTTPError as e:
+            status, content, headers = e.code, e.read(), e.headers
+        raw = RawResponse(content, {"Content-Type": headers["Content-Type"]})
+        return Response({
+            "url": url, "status": status, "response": pickle.dumps(raw)})
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stand_in():
+    server = StandInServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def make_config(tmp_path):
+    ''' Build a Config whose files live in tmp_path; keyword args override options. '''
+    def make(**options):
+        values = {
+            "USERAGENT": "IR test", "HOST": "localhost", "PORT": "1",
+            "SEEDURL": "https://www.ics.uci.edu/", "POLITENESS": "0",
+            "SAVE": str(tmp_path / "frontier.shelve"), "THREADCOUNT": "1",
+        }
+        values.update(options)
+        sections = {
+            "IDENTIFICATION": ("USERAGENT",),
+            "CONNECTION": ("HOST", "PORT", "CACHESERVER"),
+            "CRAWLER": ("SEEDURL", "POLITENESS", "ROBOTSTTL", "SITEMAPLIMIT",
+                        "SHUTDOWNTIMEOUT"),
+        }
+        parser = ConfigParser()
+        parser["LOCAL PROPERTIES"] = dict()
+        for name in sections:
+            parser[name] = dict()
+        for key, value in values.items():
+            section = next(
+                (name for name, keys in sections.items() if key in keys),
+                "LOCAL PROPERTIES")
+            parser[section][key] = value
+        config = Config(parser)
+        config.cache_server = ("localhost", 1)
+        return config
+    return make
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    ''' Run in tmp_path (Logs/ goes there) and reset the crawl-wide state after each test. '''
+    monkeypatch.chdir(tmp_path)
+    yield
+    import helpers
+    helpers.load_analytics_state({
+        "unique_pages": (), "longest_page": (None, 0),
+        "word_freq": Counter(), "stopword_freq": Counter(),
+        "subdomain_pages": {}, "path_query_seen": {}, "bad_urls": (),
+    })
+    helpers.load_templates({})
@@ -0,0 +1,36 @@
+from utils.crawl_output import CrawlReader, CrawlWriter
+
+# Line breaks other than "\n" that urls can keep in their path.
+ODD_URLS = [
+    "https://www.ics.uci.edu/a\u2028b", "https://www.ics.uci.edu/c\x0bd",
+    "https://www.ics.uci.edu/e\x85f\x1cg", "https://www.ics.uci.edu/g\rh",
+]
+
+
+def write_pages(writer, urls):
+    for i, url in enumerate(urls):
+        writer.write_page(
+            url, "www.ics.uci.edu", 200, unique=True, word_count=i,
+            content_hash=i, outlinks=urls[:i], token_counts={f"t{i}": i + 1})
+
+
+def test_round_trip_with_odd_line_breaks(tmp_path):
+    first = ["https://www.ics.uci.edu/"] + ODD_URLS
+    writer = CrawlWriter(str(tmp_path), chunk_rows=2)
+    write_pages(writer, first)
+    writer.close()
+    # A resumed writer reads the dictionaries back and keeps the same ids.
+    second = ["https://www.ics.uci.edu/after"]
+    writer = CrawlWriter(str(tmp_path), chunk_rows=2)
+    write_pages(writer, first[:1] + second)
+    writer.close()
+
+    reader = CrawlReader(str(tmp_path))
+    urls = reader.strings("urls")
+    assert urls == first + second
+    pages = list(reader.iter_pages())
+    assert [urls[page.url_id] for page in pages] == first + first[:1] + second
+    assert [urls[i] for i in pages[3].outlink_ids] == first[:3]
+    assert [reader.strings("tokens")[i] for i in pages[-1].token_ids] == ["t1"]
+    assert [(urls[url_id], list(links)) for url_id, links in reader.iter_links()][2] == (
+        first[2], [0, 1])
\ No newline at end of file
@@ -0,0 +1,78 @@
+import codecs
+
+import pytest
+
+from helpers import detect_encoding, parse_response, to_text, tokenize_with_stopwords
+
+TEXT = ("Le café ‘naïve’ résumé — don’t Straße 東京 " * 20
+        + " ".join(f"word{i}" for i in range(60)))
+# The same text without characters single-byte charsets cannot encode.
+LATIN_TEXT = TEXT.replace("東京", "")
+JAPANESE_TEXT = (TEXT.replace("‘", "'").replace("’", "'").replace("—", "-")
+                 .replace("é", "e").replace("ï", "i").replace("ß", "ss"))
+
+
+def page(text=TEXT, meta=""):
+    return (f"<html><head>{meta}<title>t</title></head>"
+            f"<body><p>{text}</p><a href='/x'>x</a></body></html>")
+
+
+# (body, Content-Type, expected codec, text the page must decode to)
+CASES = {
+    "utf-8 header": (
+        page().encode("utf-8"), "text/html; charset=UTF-8", "utf-8", TEXT),
+    "iso-8859-1 header read as windows-1252": (
+        page(LATIN_TEXT).encode("cp1252"), "text/html; charset=ISO-8859-1",
+        "cp1252", LATIN_TEXT),
+    "meta http-equiv windows-1252": (
+        page(LATIN_TEXT, '<meta http-equiv="Content-Type" '
+                         'content="text/html; charset=windows-1252">').encode("cp1252"),
+        "text/html", "cp1252", LATIN_TEXT),
+    "utf-8 BOM, undeclared": (
+        codecs.BOM_UTF8 + page().encode("utf-8"), "text/html", "utf-8-sig", TEXT),
+    "utf-16 BOM": (page().encode("utf-16"), "text/html", "utf-16", TEXT),
+    "undeclared windows-1252": (
+        page(LATIN_TEXT).encode("cp1252"), "text/html", "cp1252", LATIN_TEXT),
+    "undeclared utf-8": (page().encode("utf-8"), "text/html", "utf-8", TEXT),
+    "meta claims utf-16 in ascii": (
+        page(meta='<meta charset="utf-16">').encode("utf-8"), "text/html",
+        "utf-8", TEXT),
+    "unknown header label, meta shift_jis": (
+        page(JAPANESE_TEXT, '<meta charset="shift_jis">').encode("shift_jis"),
+        "text/html; charset=bogus", "shift_jis", JAPANESE_TEXT),
+    "header beats meta": (
+        page(meta='<meta charset="iso-8859-1">').encode("utf-8"),
+        "text/html; charset=utf-8", "utf-8", TEXT),
+}
+
+# Labels codecs.lookup knows that do not name a text encoding for pages.
+NON_TEXT_LABELS = ("undefined", "hex", "base64", "idna", "punycode", "zip", "rot13")
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_mixed_encodings(name, stand_in):
+    body, content_type, encoding, text = CASES[name]
+    assert detect_encoding(body, content_type) == encoding
+    url = "https://www.ics.uci.edu/page"
+    stand_in.add(url, body, content_type=content_type)
+    visible, hrefs = parse_response(stand_in.download(url, None))
+    assert "�" not in visible
+    assert tokenize_with_stopwords(visible) == tokenize_with_stopwords(f"t {text} x")
+    assert hrefs == ["/x"]
+
+
+@pytest.mark.parametrize("label", NON_TEXT_LABELS)
+def test_non_text_labels_are_ignored(label, stand_in):
+    body = page(meta=f'<meta charset="{label}">').encode("utf-8")
+    assert detect_encoding(body, f"text/html; charset={label}") == "utf-8"
+    assert detect_encoding(body, "text/html") == "utf-8"
+    url = "https://www.ics.uci.edu/page"
+    stand_in.add(url, body, content_type=f"text/html; charset={label}")
+    visible, hrefs = parse_response(stand_in.download(url, None))
+    assert "東京" in visible and hrefs == ["/x"]
+
+
+@pytest.mark.parametrize("label", NON_TEXT_LABELS + ("no-such-codec",))
+def test_to_text_falls_back_on_unusable_codecs(label):
+    body = page(LATIN_TEXT).encode("cp1252")
+    assert to_text(body, encoding=label) == page(LATIN_TEXT)
\ No newline at end of file
@@ -0,0 +1,24 @@
+from utils.index import IndexBuilder, IndexReader
+
+# Urls can keep line breaks other than "\n" in their path.
+URLS = [
+    "https://www.ics.uci.edu/a\u2028b", "https://www.ics.uci.edu/c\rd",
+    "https://www.ics.uci.edu/e\x0bf", "https://www.ics.uci.edu/plain",
+]
+
+
+def test_doc_ids_survive_odd_urls_and_resume(tmp_path):
+    builder = IndexBuilder(str(tmp_path), restart=True)
+    for i, url in enumerate(URLS[:3]):
+        assert builder.add_document(url, {"shared": 1, f"only{i}": 2}) == i
+    builder.flush()
+    # A resumed builder counts the same number of docs as were written.
+    builder = IndexBuilder(str(tmp_path))
+    assert builder.add_document(URLS[3], {"shared": 1, "only3": 2}) == 3
+    builder.finish()
+
+    index = IndexReader(str(tmp_path))
+    assert [index.url(doc_id) for doc_id in range(len(URLS))] == URLS
+    assert index.boolean("only1 shared") == [1]
+    assert index.url(index.search("only3")[0][1]) == URLS[3]
+    index.close()
\ No newline at end of file
@@ -0,0 +1,153 @@
+import os
+import signal
+import threading
+
+import pytest
+
+import crawler.worker
+import helpers
+import utils.robots
+from crawler import Crawler
+from crawler.frontier import STATE_SAVE_EVERY
+from utils.crawl_output import CrawlReader
+
+PAGES = 150
+SITE = "https://www.ics.uci.edu"
+
+
+def page_url(i):
+    return f"{SITE}/page/{i}"
+
+
+@pytest.fixture
+def site(stand_in, monkeypatch):
+    ''' PAGES distinct pages, each linking to three others; page 0 is the seed. '''
+    for i in range(PAGES):
+        words = " ".join(f"word{i}x{j} research" for j in range(40))
+        links = "".join(
+            f'<a href="/page/{(i * 7 + k) % PAGES}">link</a>' for k in range(1, 4))
+        stand_in.add(page_url(i), f"<html><body><p>{words}</p>{links}</body></html>")
+    monkeypatch.setattr(utils.robots, "download", stand_in.download)
+    monkeypatch.setattr(crawler.worker, "download", stand_in.download)
+    return stand_in
+
+
+@pytest.fixture
+def signal_handlers():
+    ''' Crawler.start installs SIGINT/SIGTERM handlers; put the old ones back. '''
+    saved = {signum: signal.getsignal(signum) for signum in (signal.SIGINT, signal.SIGTERM)}
+    yield
+    for signum, handler in saved.items():
+        signal.signal(signum, handler)
+
+
+def fetched_pages(server):
+    return [path for host, path in server.requests if path.startswith("/page/")]
+
+
+def test_interrupt_and_resume(site, make_config, monkeypatch, signal_handlers):
+    config = make_config(
+        SEEDURL=page_url(0), THREADCOUNT="2", SHUTDOWNTIMEOUT="0.5")
+    release = threading.Event()
+    stuck = list()
+
+    def interrupting_download(url, config, logger=None):
+        if (url.startswith(f"{SITE}/page/") and not stuck
+                and len(fetched_pages(site)) >= 40):
+            # Ctrl-C arrives while this download hangs past SHUTDOWNTIMEOUT.
+            stuck.append(url)
+            os.kill(os.getpid(), signal.SIGINT)
+            release.wait()
+        return site.download(url, config, logger)
+
+    monkeypatch.setattr(crawler.worker, "download", interrupting_download)
+    first = Crawler(config, restart=True)
+    try:
+        first.start()
+        first_run = fetched_pages(site)
+        assert stuck and stuck[0] in first.frontier.in_flight
+        assert 40 <= len(first_run) < PAGES
+        assert os.path.exists(first.frontier.checkpoint_file)
+
+        monkeypatch.setattr(crawler.worker, "download", site.download)
+        del site.requests[:]
+        second = Crawler(config, restart=False)
+        second.start()
+        second_run = fetched_pages(site)
+    finally:
+        # Let the hung worker of the first run finish against its closed frontier.
+        release.set()
+        for worker in first.workers:
+            worker.join(5)
+
+    # Only the url in flight at the interrupt is fetched again, and first
+    # (by one of the two workers).
+    assert stuck[0][len(SITE):] in second_run[:2]
+    assert set(first_run) & set(second_run) == set()
+    assert len(second_run) == len(set(second_run))
+    # No url is lost: together the runs fetch every page once.
+    assert sorted(first_run + second_run) == sorted(f"/page/{i}" for i in range(PAGES))
+    assert len(helpers.UNIQUE_PAGES) == PAGES
+
+
+def test_analytics_snapshot_follows_the_save_file(
+        site, make_config, monkeypatch, caplog, tmp_path):
+    monkeypatch.setattr(helpers, "CRAWL_OUTPUT", None)
+    config = make_config(SEEDURL=page_url(0), OUTPUT=str(tmp_path / "output"))
+    first = Crawler(config, restart=True)
+    # Crash at the end: the save file is synced but nothing is checkpointed.
+    monkeypatch.setattr(first.frontier, "checkpoint", first.frontier.save.close)
+    first.start_async()
+    first.join()
+    assert len(helpers.UNIQUE_PAGES) == PAGES
+
+    second = Crawler(config, restart=False)
+    # The periodic snapshot holds every page completed when it was written.
+    last_save = PAGES // STATE_SAVE_EVERY * STATE_SAVE_EVERY
+    assert last_save <= len(helpers.UNIQUE_PAGES) < PAGES
+    assert f"miss up to {PAGES - len(helpers.UNIQUE_PAGES)} urls" in caplog.text
+    assert not second.frontier.to_be_downloaded
+    second.frontier.checkpoint()
+    # The crawl output was flushed with the snapshot.
+    recorded = CrawlReader(config.output_dir)
+    urls = recorded.strings("urls")
+    assert {urls[page.url_id] for page in recorded.iter_pages()} >= set(helpers.UNIQUE_PAGES)
+
+
+def test_failing_page_does_not_stop_the_worker(site, make_config, monkeypatch):
+    scraper = crawler.worker.scraper.scraper
+
+    def failing_scraper(url, resp, hashed=False):
+        if url == page_url(1):
+            raise ValueError("broken page")
+        return scraper(url, resp, hashed)
+
+    monkeypatch.setattr(crawler.worker.scraper, "scraper", failing_scraper)
+    run = Crawler(make_config(SEEDURL=page_url(0)), restart=True)
+    run.start_async()
+    run.join()
+    # The failed url is completed (not left in flight) and the crawl goes on.
+    assert not run.frontier.in_flight
+    assert len(helpers.UNIQUE_PAGES) == PAGES - 1
+    assert "/page/1" in fetched_pages(site)
+
+
+def test_failed_downloads_are_retried_not_completed(site, make_config, monkeypatch):
+    failures = list()
+
+    def unreachable_at_first(url, config, logger=None):
+        if len(failures) < 5:
+            failures.append(url)
+            raise ConnectionError("cache server down")
+        return site.download(url, config, logger)
+
+    monkeypatch.setattr(crawler.worker, "RETRY_DELAY", 0.05)
+    monkeypatch.setattr(crawler.worker, "download", unreachable_at_first)
+    run = Crawler(make_config(SEEDURL=page_url(0)), restart=True)
+    run.start_async()
+    run.join()
+    # Every page is downloaded and completed once, the failed seed included.
+    assert failures == [page_url(0)] * 5
+    assert sorted(fetched_pages(site)) == sorted(f"/page/{i}" for i in range(PAGES))
+    assert run.frontier.completed_count == PAGES
+    assert len(helpers.UNIQUE_PAGES) == PAGES
\ No newline at end of file
@@ -0,0 +1,180 @@
+import logging
+import threading
+import time
+
+import pytest
+
+import utils.robots
+import crawler.frontier
+import crawler.worker
+from crawler import Crawler
+from crawler.frontier import Frontier
+from utils.robots import RobotsCache, parse_robots, ERROR_TTL
+
+ROBOTS = """\
+User-agent: *
+Disallow: /private
+Allow: /private/public
+Disallow: /*.pdf$
+Crawl-delay: 2
+Sitemap: https://www.ics.uci.edu/sitemap.xml
+
+User-agent: IR
+Disallow: /only-for-us
+Disallow: /private
+Crawl-delay: 3
+"""
+
+SITEMAP = """<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url><loc>https://www.ics.uci.edu/a</loc></url>
+  <url><loc>https://www.ics.uci.edu/b/</loc></url>
+  <url><loc>https://www.ics.uci.edu/private/c</loc></url>
+  <url><loc>https://www.stat.uci.edu/other-host</loc></url>
+</urlset>
+"""
+
+
+@pytest.fixture
+def robots(stand_in, make_config, monkeypatch):
+    monkeypatch.setattr(utils.robots, "download", stand_in.download)
+    return RobotsCache(make_config(), logging.getLogger("test"))
+
+
+def test_parse_robots_longest_match_and_agent_groups():
+    rules = parse_robots(ROBOTS, "IR UW26")
+    # The "IR" group is more specific than "*" and replaces it entirely.
+    assert not rules.allowed("https://www.ics.uci.edu/only-for-us/x")
+    assert not rules.allowed("https://www.ics.uci.edu/private/public/x")
+    assert rules.allowed("https://www.ics.uci.edu/paper.pdf")
+    assert rules.crawl_delay == 3
+    rules = parse_robots(ROBOTS, "SomeBot")
+    assert not rules.allowed("https://www.ics.uci.edu/private/x")
+    assert rules.allowed("https://www.ics.uci.edu/private/public/x")
+    assert not rules.allowed("https://www.ics.uci.edu/paper.pdf")
+    assert rules.allowed("https://www.ics.uci.edu/paper.pdf?x=1")
+    assert rules.crawl_delay == 2
+
+
+def test_rules_fetched_from_server_and_cached(stand_in, robots):
+    stand_in.add("https://www.ics.uci.edu/robots.txt", ROBOTS, content_type="text/plain")
+    assert not robots.allowed("https://www.ics.uci.edu/private/x")
+    assert robots.allowed("https://www.ics.uci.edu/about")
+    assert robots.crawl_delay("https://www.ics.uci.edu/about") == 3
+    assert stand_in.requests.count(("www.ics.uci.edu", "/robots.txt")) == 1
+
+
+def test_bom_does_not_hide_first_group(stand_in, robots):
+    stand_in.add(
+        "https://www.ics.uci.edu/robots.txt",
+        b"\xef\xbb\xbfUser-agent: *\nDisallow: /private\n")
+    rules, fetched = robots.lookup("https://www.ics.uci.edu/")
+    assert fetched and len(rules.rules) == 1
+    assert not rules.allowed("https://www.ics.uci.edu/private")
+
+
+def test_missing_robots_allows_everything(robots):
+    rules, _ = robots.lookup("https://www.ics.uci.edu/")
+    assert rules.allowed("https://www.ics.uci.edu/private")
+    assert robots.entries[("https", "www.ics.uci.edu")][1] > ERROR_TTL * 2
+
+
+@pytest.mark.parametrize("status", [500, 503])
+def test_server_error_disallows_for_a_short_time(
+        stand_in, robots, status, make_config, monkeypatch):
+    stand_in.add("https://www.ics.uci.edu/robots.txt", "", status=status)
+    rules, _ = robots.lookup("https://www.ics.uci.edu/")
+    assert not rules.allowed("https://www.ics.uci.edu/anything")
+    assert rules.unavailable
+    expires = robots.entries[("https", "www.ics.uci.edu")][1]
+    # Retried after ERROR_TTL rather than cached for ROBOTSTTL.
+    stand_in.add("https://www.ics.uci.edu/robots.txt", "User-agent: *\nDisallow:\n")
+    robots.entries[("https", "www.ics.uci.edu")] = (rules, 0)
+    assert robots.allowed("https://www.ics.uci.edu/anything")
+    assert expires - robots.entries[("https", "www.ics.uci.edu")][1] < ERROR_TTL
+
+    # A crawl holds the host's urls back until the retry instead of dropping them.
+    stand_in.add("https://www.ics.uci.edu/robots.txt", "", status=status)
+
+    def unavailable_once(url, config, logger=None):
+        resp = stand_in.download(url, config, logger)
+        stand_in.add("https://www.ics.uci.edu/robots.txt", "User-agent: *\nDisallow:\n")
+        return resp
+
+    monkeypatch.setattr(utils.robots, "ERROR_TTL", 0.5)
+    monkeypatch.setattr(utils.robots, "download", unavailable_once)
+    monkeypatch.setattr(crawler.worker, "download", stand_in.download)
+    pages = [f"https://www.ics.uci.edu/p{i}" for i in range(3)]
+    for i, url in enumerate(pages):
+        stand_in.add(url, f"<html><body><p>page {i} of the research group</p></body></html>")
+    del stand_in.requests[:]
+    crawl = Crawler(
+        make_config(SEEDURL=",".join(pages), SITEMAPLIMIT="0"), restart=True)
+    crawl.start_async()
+    crawl.join()
+    fetched = [path for _, path in stand_in.requests]
+    assert fetched.count("/robots.txt") == 2
+    assert sorted(path for path in fetched if path != "/robots.txt") == ["/p0", "/p1", "/p2"]
+    assert not crawl.frontier.held and not crawl.frontier.in_flight
+    # Each page was completed once, by its download.
+    assert crawl.frontier.completed_count == 3
+
+
+def test_sitemap_urls_seed_the_frontier(stand_in, make_config, monkeypatch):
+    monkeypatch.setattr(utils.robots, "download", stand_in.download)
+    monkeypatch.setattr(crawler.frontier, "download", stand_in.download)
+    stand_in.add("https://www.ics.uci.edu/robots.txt", ROBOTS)
+    stand_in.add("https://www.ics.uci.edu/sitemap.xml", SITEMAP, content_type="application/xml")
+    frontier = Frontier(make_config(SITEMAPLIMIT="100"), restart=True)
+    assert frontier.check_robots("https://www.ics.uci.edu/")
+    queued = set(frontier.to_be_downloaded)
+    assert {"https://www.ics.uci.edu/a", "https://www.ics.uci.edu/b"} <= queued
+    # Disallowed and other-host sitemap entries are not queued.
+    assert "https://www.ics.uci.edu/private/c" not in queued
+    assert "https://www.stat.uci.edu/other-host" not in queued
+    frontier.checkpoint()
+
+
+def test_concurrent_workers_fetch_robots_and_sitemaps_once(
+        stand_in, make_config, monkeypatch):
+    def slow_download(url, config, logger=None):
+        time.sleep(0.2)
+        return stand_in.download(url, config, logger)
+
+    monkeypatch.setattr(utils.robots, "download", slow_download)
+    monkeypatch.setattr(crawler.frontier, "download", slow_download)
+    stand_in.add("https://www.ics.uci.edu/robots.txt", ROBOTS)
+    stand_in.add("https://www.ics.uci.edu/sitemap.xml", SITEMAP, content_type="application/xml")
+    frontier = Frontier(make_config(SITEMAPLIMIT="100"), restart=True)
+    rules = frontier.robots.lookup("https://www.ics.uci.edu/")[0]
+    del stand_in.requests[:]
+    frontier.robots.entries.clear()
+    workers = [
+        threading.Thread(target=frontier.check_robots, args=(f"https://www.ics.uci.edu/{i}",))
+        for i in range(4)]
+    workers += [
+        threading.Thread(target=frontier._seed_sitemaps, args=("https://www.ics.uci.edu/", rules))
+        for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    paths = [path for _, path in stand_in.requests]
+    assert paths.count("/robots.txt") == 1
+    assert paths.count("/sitemap.xml") == 1
+    frontier.checkpoint()
+
+
+def test_reserve_fetch_spaces_one_host_across_workers(stand_in, make_config, monkeypatch):
+    monkeypatch.setattr(utils.robots, "download", stand_in.download)
+    stand_in.add("https://www.ics.uci.edu/robots.txt", "User-agent: *\nCrawl-delay: 5\n")
+    frontier = Frontier(make_config(POLITENESS="0.5", SITEMAPLIMIT="0"), restart=True)
+    # Three workers asking for the same host get slots Crawl-delay apart...
+    waits = [frontier.reserve_fetch(f"https://www.ics.uci.edu/{i}") for i in range(3)]
+    assert waits[0] == pytest.approx(0, abs=0.1)
+    assert waits[1] == pytest.approx(5, abs=0.1)
+    assert waits[2] == pytest.approx(10, abs=0.1)
+    # ...while another host only waits for its own POLITENESS slots.
+    assert frontier.reserve_fetch("https://www.cs.uci.edu/") == pytest.approx(0, abs=0.1)
+    assert frontier.reserve_fetch("https://www.cs.uci.edu/x") == pytest.approx(0.5, abs=0.1)
+    frontier.checkpoint()
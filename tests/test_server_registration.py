@@ -0,0 +1,36 @@
+import sys
+import types
+
+import pytest
+
+from utils.server_registration import get_cache_server
+
+
+@pytest.fixture
+def registrations(monkeypatch):
+    ''' Fake spacetime Node recording the fresh flag of each registration. '''
+    calls = list()
+
+    class Node(object):
+        def __init__(self, target, Types, dataframe):
+            pass
+
+        def start(self, user_agent, fresh):
+            calls.append(fresh)
+            return ("registered", 9000 + len(calls))
+
+    monkeypatch.setitem(sys.modules, "spacetime", types.SimpleNamespace(Node=Node))
+    monkeypatch.setitem(sys.modules, "utils.pcc_models", types.SimpleNamespace(Register=None))
+    return calls
+
+
+def test_cached_address_only_reused_with_the_save_file(make_config, registrations):
+    config = make_config()
+    assert get_cache_server(config, restart=False) == ("registered", 9001)
+    # No save file yet: the next run still starts fresh, so it registers again.
+    assert get_cache_server(config, restart=False) == ("registered", 9002)
+    assert registrations == [True, True]
+    open(config.save_file, "w").close()
+    assert get_cache_server(config, restart=False) == ("registered", 9002)
+    assert get_cache_server(config, restart=True) == ("registered", 9003)
+    assert registrations == [True, True, True]
\ No newline at end of file
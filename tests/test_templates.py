@@ -0,0 +1,77 @@
+import os
+import random
+
+import helpers
+from crawler.frontier import Frontier, STATE_SAVE_EVERY
+from helpers import (
+    CONTENT_HASHES, dump_templates, is_duplicate_content, load_templates,
+    record_template_fetch, template_allows, url_template)
+from imports import CONTENT_HASH_SLOTS, TEMPLATE_MIN_FETCHES
+
+
+def test_url_template_collapses_ids_and_dates():
+    assert (url_template("https://www.ics.uci.edu/events/2019-01-05/123?b=1&a=2")
+            == url_template("https://www.ics.uci.edu/events/2020-11-30/77?a=9&b=3"))
+
+
+def test_url_template_keeps_content_query_values():
+    assert (url_template("https://wiki.ics.uci.edu/doku.php?id=projects:a&rev=1588888888")
+            == url_template("https://wiki.ics.uci.edu/doku.php?rev=1600000000&id=projects:a"))
+    assert (url_template("https://wiki.ics.uci.edu/doku.php?id=projects:a")
+            != url_template("https://wiki.ics.uci.edu/doku.php?id=projects:b"))
+    # A trap on one wiki page does not block the others.
+    for i in range(TEMPLATE_MIN_FETCHES):
+        record_template_fetch(
+            f"https://wiki.ics.uci.edu/doku.php?id=cal&date=2020-01-{i % 28 + 1:02d}", "thin")
+    assert not template_allows("https://wiki.ics.uci.edu/doku.php?id=cal&date=2021-05-05")
+    assert template_allows("https://wiki.ics.uci.edu/doku.php?id=projects:a")
+
+
+def test_low_yield_template_is_blocked():
+    for i in range(TEMPLATE_MIN_FETCHES):
+        record_template_fetch(f"https://wiki.ics.uci.edu/doku.php/page/{i}", "thin")
+    assert not template_allows("https://wiki.ics.uci.edu/doku.php/page/999")
+    assert template_allows("https://wiki.ics.uci.edu/doku.php/other")
+
+
+def test_content_hashes_stay_bounded():
+    rnd = random.Random(1)
+    digests = [rnd.getrandbits(64) for _ in range(CONTENT_HASH_SLOTS // 4)]
+    assert not any(is_duplicate_content(d) for d in digests)
+    assert all(is_duplicate_content(d) for d in digests[-1000:])
+    # Far more digests than slots: the table never grows.
+    size = len(CONTENT_HASHES)
+    for d in range(1, 2 * CONTENT_HASH_SLOTS, 7):
+        is_duplicate_content(d)
+    assert len(CONTENT_HASHES) == size == CONTENT_HASH_SLOTS
+    # Digest 0 is not confused with an empty slot.
+    load_templates({})
+    assert not is_duplicate_content(0)
+    assert is_duplicate_content(0)
+
+
+def test_dump_and_load_round_trip():
+    record_template_fetch("https://www.ics.uci.edu/a/1", "new")
+    is_duplicate_content(42)
+    state = dump_templates()
+    load_templates({})
+    assert not helpers.URL_TEMPLATES
+    load_templates(state)
+    assert url_template("https://www.ics.uci.edu/a/1") in helpers.URL_TEMPLATES
+    assert is_duplicate_content(42)
+
+
+def test_periodic_save_runs_outside_the_frontier_lock(make_config, monkeypatch):
+    frontier = Frontier(make_config(), restart=True)
+    held = list()
+    monkeypatch.setattr(
+        frontier, "save_state",
+        lambda: held.append(frontier.lock._lock._is_owned()))
+    for i in range(STATE_SAVE_EVERY):
+        frontier.add_urls(
+            [f"https://www.ics.uci.edu/{i}"],
+            completed_url=frontier.get_tbd_url())
+    assert held == [False]
+    monkeypatch.delattr(frontier, "save_state")
+    frontier.checkpoint()
+    assert os.path.exists(frontier.templates_file)
@@ -0,0 +1,74 @@
+import pickle
+import random
+import threading
+
+import pytest
+
+import utils.urlstore
+from utils.urlstore import UrlSet, _Run
+
+
+@pytest.fixture(autouse=True)
+def small_buffer(monkeypatch):
+    # Flush (and merge) every few adds so small sets have many runs.
+    monkeypatch.setattr(utils.urlstore, "BUFFER_SIZE", 8)
+
+
+def urls(count, seed=0):
+    rnd = random.Random(seed)
+    hosts = ["https://www.ics.uci.edu", "http://wiki.ics.uci.edu", "https://cs.uci.edu"]
+    return [f"{rnd.choice(hosts)}/{rnd.randrange(10 ** 6)}/page?id={i}"
+            for i in range(count)]
+
+
+def test_behaves_like_a_set():
+    added, missing = urls(2000), urls(500, seed=1)
+    url_set = UrlSet(added[:300])
+    for url in added:
+        url_set.add(url)
+    url_set.merge()
+    assert len(url_set) == len(set(added))
+    assert all(url in url_set for url in added)
+    assert not any(url in url_set for url in missing)
+    assert list(url_set) == sorted(set(added), key=url_set._key)
+    assert len(url_set._runs) < 10
+    copy = pickle.loads(pickle.dumps(url_set))
+    assert list(copy) == list(url_set) and copy.add(missing[0])
+    assert missing[0] not in url_set
+
+
+def test_merge_runs_outside_the_lock(monkeypatch):
+    lock = threading.Lock()
+    url_set = UrlSet()
+    merges = list()
+
+    class Run(_Run):
+        def __init__(self, sorted_keys):
+            if not isinstance(sorted_keys, list):
+                # A merge (new runs are built from sorted lists).
+                merges.append(lock.locked())
+            super().__init__(sorted_keys)
+
+    monkeypatch.setattr(utils.urlstore, "_Run", Run)
+    for url in urls(500):
+        with lock:
+            url_set.add(url)
+        url_set.merge(lock)
+    assert merges and not any(merges)
+    assert len(url_set._runs) < 10 and not url_set._merge_due
+
+
+def test_merge_dropped_when_the_set_is_cleared(monkeypatch):
+    url_set = UrlSet()
+    for url in urls(20):
+        url_set.add(url)
+    build = utils.urlstore._Run
+
+    def clear_while_merging(keys):
+        url_set.clear()
+        url_set.add("https://www.ics.uci.edu/after")
+        return build(keys)
+
+    monkeypatch.setattr(utils.urlstore, "_Run", clear_while_merging)
+    url_set.merge()
+    assert list(url_set) == ["https://www.ics.uci.edu/after"]
\ No newline at end of file
@@ -0,0 +1,21 @@
+def write_analytics_report(path, unique_pages, longest_words, longest_url,
+                           word_freq, stopword_freq, subdomain_counts):
+    '''
+    Write the crawl analytics summary. word_freq and stopword_freq are
+    Counters, subdomain_counts maps subdomain -> number of unique pages.
+    '''
+    with open(path, "w") as f:
+        f.write(f"Unique pages: {unique_pages}\n")
+        f.write(f"Longest page ({longest_words} words):\n{longest_url}\n\n")
+
+        f.write("Top 50 content words (non-stopwords):\n")
+        for w, c in word_freq.most_common(50):
+            f.write(f"{w}, {c}\n")
+
+        f.write("\nTop 50 stopwords:\n")
+        for w, c in stopword_freq.most_common(50):
+            f.write(f"{w}, {c}\n")
+
+        f.write("\nSubdomains under uci.edu:\n")
+        for sd in sorted(subdomain_counts):
+            f.write(f"{sd}, {subdomain_counts[sd]}\n")
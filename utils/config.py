@@ -9,11 +9,21 @@ class Config(object):
         assert re.match(r"^[a-zA-Z0-9_ ,]+$", self.user_agent), "User agent should not have any special characters outside '_', ',' and 'space'"
         self.threads_count = int(config["LOCAL PROPERTIES"]["THREADCOUNT"])
         self.save_file = config["LOCAL PROPERTIES"]["SAVE"]
+        self.output_dir = config["LOCAL PROPERTIES"].get("OUTPUT", "").strip() or None
+        self.priority_file = config["LOCAL PROPERTIES"].get("PRIORITY", "").strip() or None
+        self.index_dir = config["LOCAL PROPERTIES"].get("INDEX", "").strip() or None
+        self.profile_dir = config["LOCAL PROPERTIES"].get("PROFILEDIR", "").strip() or None
+        self.profile_rate = float(config["LOCAL PROPERTIES"].get("PROFILERATE", "100"))
+        self.profile_window = float(config["LOCAL PROPERTIES"].get("PROFILEWINDOW", "10"))
 
         self.host = config["CONNECTION"]["HOST"]
         self.port = int(config["CONNECTION"]["PORT"])
+        self.cache_server_override = config["CONNECTION"].get("CACHESERVER", "").strip() or None
 
         self.seed_urls = config["CRAWLER"]["SEEDURL"].split(",")
         self.time_delay = float(config["CRAWLER"]["POLITENESS"])
+        self.robots_ttl = float(config["CRAWLER"].get("ROBOTSTTL", "86400"))
+        self.sitemap_limit = int(config["CRAWLER"].get("SITEMAPLIMIT", "50000"))
+        self.shutdown_timeout = float(config["CRAWLER"].get("SHUTDOWNTIMEOUT", "30"))
 
         self.cache_server = None
\ No newline at end of file
@@ -0,0 +1,260 @@
+import os
+import sys
+import json
+import mmap
+import zlib
+import threading
+from array import array
+from collections import namedtuple
+
+# Each chunk file holds up to CHUNK_ROWS page records, stored column by column.
+CHUNK_ROWS = 1000
+CHUNK_MAGIC = b"CRAWLCHUNK1\n"
+CHUNK_PREFIX = "pages-"
+CHUNK_SUFFIX = ".chunk"
+# id -> string dictionaries: line number is the id. Lines end with "\n" only;
+# values may hold other line breaks (\r, \x0b, \u2028, ...), so never splitlines().
+DICTIONARIES = ("urls", "hosts", "tokens")
+
+# name -> array typecode. *_offsets columns have one extra entry per chunk and
+# delimit each record's slice of the matching *_ids / token_counts column.
+COLUMNS = (
+    ("url_id", "I"),
+    ("host_id", "I"),
+    ("status", "H"),
+    ("unique", "B"),
+    ("word_count", "I"),
+    ("content_hash", "Q"),
+    ("outlink_offsets", "I"),
+    ("outlink_ids", "I"),
+    ("token_offsets", "I"),
+    ("token_ids", "I"),
+    ("token_counts", "I"),
+)
+
+PageRecord = namedtuple(
+    "PageRecord",
+    ["url_id", "host_id", "status", "unique", "word_count", "content_hash",
+     "outlink_ids", "token_ids", "token_counts"])
+
+
+def _to_le(values):
+    # Columns are stored little endian whatever the platform.
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _split_lines(text):
+    # Every line ends with "\n", so the last piece is the empty tail.
+    return text.split("\n")[:-1]
+
+
+def _from_le(typecode, raw):
+    values = array(typecode)
+    values.frombytes(raw)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+class _Dictionary(object):
+    ''' Append-only string <-> id table backed by a text file. '''
+
+    def __init__(self, path):
+        self.path = path
+        self.ids = dict()
+        self.pending = list()
+        if os.path.exists(path):
+            with open(path, "rb+") as f:
+                data = f.read()
+                if data and not data.endswith(b"\n"):
+                    # Drop a line cut short by a crash.
+                    data = data[:data.rfind(b"\n") + 1]
+                    f.truncate(len(data))
+            for line in _split_lines(data.decode("utf-8")):
+                self.ids[line] = len(self.ids)
+
+    def get_id(self, value):
+        value_id = self.ids.get(value)
+        if value_id is None:
+            value_id = self.ids[value] = len(self.ids)
+            self.pending.append(value)
+        return value_id
+
+    def flush(self):
+        if self.pending:
+            with open(self.path, "a", encoding="utf-8", newline="") as f:
+                f.write("\n".join(self.pending) + "\n")
+            self.pending = list()
+
+
+class CrawlWriter(object):
+    '''
+    Streams per-page records into chunked, zlib-compressed columnar files.
+    Strings (urls, hosts, tokens) are stored once in dictionary files and
+    referenced by id. Safe to call from several worker threads.
+    '''
+
+    def __init__(self, directory, restart=False, chunk_rows=CHUNK_ROWS):
+        self.directory = directory
+        self.chunk_rows = chunk_rows
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        chunks = _chunk_files(directory)
+        if restart:
+            for name in chunks + [f"{d}.txt" for d in DICTIONARIES]:
+                path = os.path.join(directory, name)
+                if os.path.exists(path):
+                    os.remove(path)
+            chunks = list()
+        self.chunk_index = len(chunks)
+        self.dictionaries = {
+            name: _Dictionary(os.path.join(directory, f"{name}.txt"))
+            for name in DICTIONARIES}
+        self._reset()
+
+    def _reset(self):
+        self.rows = 0
+        self.columns = {name: array(code) for name, code in COLUMNS}
+        self.columns["outlink_offsets"].append(0)
+        self.columns["token_offsets"].append(0)
+
+    def url_id(self, url):
+        with self.lock:
+            return self.dictionaries["urls"].get_id(url)
+
+    def write_page(self, url, host, status, unique=False, word_count=0,
+                   content_hash=0, outlinks=(), token_counts=None):
+        ''' Append one page record; token_counts maps token -> count. '''
+        with self.lock:
+            urls = self.dictionaries["urls"]
+            tokens = self.dictionaries["tokens"]
+            columns = self.columns
+            columns["url_id"].append(urls.get_id(url))
+            columns["host_id"].append(self.dictionaries["hosts"].get_id(host))
+            columns["status"].append(status if 0 <= status < 65536 else 0)
+            columns["unique"].append(1 if unique else 0)
+            columns["word_count"].append(word_count)
+            columns["content_hash"].append(content_hash)
+            columns["outlink_ids"].extend(urls.get_id(link) for link in outlinks)
+            columns["outlink_offsets"].append(len(columns["outlink_ids"]))
+            if token_counts:
+                for token, count in token_counts.items():
+                    columns["token_ids"].append(tokens.get_id(token))
+                    columns["token_counts"].append(count)
+            columns["token_offsets"].append(len(columns["token_ids"]))
+            self.rows += 1
+            if self.rows >= self.chunk_rows:
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    close = flush
+
+    def _flush(self):
+        if not self.rows:
+            return
+        # Dictionaries first, so a chunk never references an unwritten id.
+        for dictionary in self.dictionaries.values():
+            dictionary.flush()
+        blobs = list()
+        header = {"rows": self.rows, "columns": list()}
+        for name, code in COLUMNS:
+            blob = zlib.compress(_to_le(self.columns[name]), 6)
+            header["columns"].append([name, code, len(blob)])
+            blobs.append(blob)
+        path = os.path.join(
+            self.directory,
+            f"{CHUNK_PREFIX}{self.chunk_index:06d}{CHUNK_SUFFIX}")
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(CHUNK_MAGIC)
+            f.write(json.dumps(header).encode("utf-8") + b"\n")
+            for blob in blobs:
+                f.write(blob)
+        os.replace(f"{path}.tmp", path)
+        self.chunk_index += 1
+        self._reset()
+
+
+def _chunk_files(directory):
+    return sorted(
+        name for name in os.listdir(directory)
+        if name.startswith(CHUNK_PREFIX) and name.endswith(CHUNK_SUFFIX))
+
+
+class CrawlReader(object):
+    '''
+    Lazily reads what CrawlWriter produced. Chunk files are memory-mapped and
+    only the requested columns are decompressed.
+    '''
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._strings = dict()
+
+    def strings(self, name):
+        ''' The id -> string list of one of DICTIONARIES, loaded on first use. '''
+        if name not in self._strings:
+            path = os.path.join(self.directory, f"{name}.txt")
+            values = list()
+            if os.path.exists(path):
+                with open(path, encoding="utf-8", newline="") as f:
+                    values = _split_lines(f.read())
+            self._strings[name] = values
+        return self._strings[name]
+
+    def chunk_paths(self):
+        return [
+            os.path.join(self.directory, name)
+            for name in _chunk_files(self.directory)]
+
+    def iter_columns(self, names=None):
+        ''' Yield one {column name: array} dict per chunk. '''
+        wanted = set(names) if names is not None else None
+        for path in self.chunk_paths():
+            with open(path, "rb") as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if data[:len(CHUNK_MAGIC)] != CHUNK_MAGIC:
+                    raise ValueError(f"{path} is not a crawl chunk.")
+                header_end = data.find(b"\n", len(CHUNK_MAGIC)) + 1
+                header = json.loads(data[len(CHUNK_MAGIC):header_end])
+                columns = dict()
+                position = header_end
+                for name, code, size in header["columns"]:
+                    if wanted is None or name in wanted:
+                        columns[name] = _from_le(
+                            code, zlib.decompress(data[position:position + size]))
+                    position += size
+                yield columns
+
+    def iter_pages(self):
+        ''' Yield a PageRecord per page, in crawl order. '''
+        for columns in self.iter_columns():
+            outlink_offsets = columns["outlink_offsets"]
+            token_offsets = columns["token_offsets"]
+            for row in range(len(columns["url_id"])):
+                out_start, out_end = outlink_offsets[row], outlink_offsets[row + 1]
+                tok_start, tok_end = token_offsets[row], token_offsets[row + 1]
+                yield PageRecord(
+                    columns["url_id"][row],
+                    columns["host_id"][row],
+                    columns["status"][row],
+                    bool(columns["unique"][row]),
+                    columns["word_count"][row],
+                    columns["content_hash"][row],
+                    columns["outlink_ids"][out_start:out_end],
+                    columns["token_ids"][tok_start:tok_end],
+                    columns["token_counts"][tok_start:tok_end])
+
+    def iter_links(self):
+        ''' Yield (url_id, outlink ids array) per page, reading only those columns. '''
+        for columns in self.iter_columns(
+                ("url_id", "outlink_offsets", "outlink_ids")):
+            offsets = columns["outlink_offsets"]
+            outlinks = columns["outlink_ids"]
+            for row, url_id in enumerate(columns["url_id"]):
+                yield url_id, outlinks[offsets[row]:offsets[row + 1]]
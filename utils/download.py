@@ -1,10 +1,11 @@
-import requests
-import cbor
 import time
 
 from utils.response import Response
 
 def download(url, config, logger=None):
+    # Imported on first download rather than at startup.
+    import requests
+    import cbor
     host, port = config.cache_server
     resp = requests.get(
         f"http://{host}:{port}/",
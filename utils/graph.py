@@ -0,0 +1,115 @@
+import numpy as np
+
+
+class LinkGraph(object):
+    '''
+    Directed link graph in CSR form: the outlinks of node i are
+    indices[indptr[i]:indptr[i + 1]]. Node ids are the url ids of the crawl
+    output, so they index CrawlReader.strings("urls").
+    '''
+
+    def __init__(self, indptr, indices):
+        self.indptr = indptr
+        self.indices = indices
+        self.num_nodes = len(indptr) - 1
+
+    @classmethod
+    def from_edges(cls, sources, targets, num_nodes):
+        ''' Build from parallel edge arrays; duplicate edges and self-links are dropped. '''
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        keep = sources != targets
+        # One int64 key per edge: sorting it sorts by source, then target.
+        keys = np.unique(sources[keep] * num_nodes + targets[keep])
+        index_type = np.int32 if num_nodes < 2 ** 31 else np.int64
+        sources = (keys // num_nodes).astype(index_type)
+        indices = (keys % num_nodes).astype(index_type)
+        del keys
+        indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=num_nodes), out=indptr[1:])
+        return cls(indptr, indices)
+
+    @classmethod
+    def from_crawl_output(cls, reader):
+        ''' Build from the url_id/outlink columns of a CrawlReader. '''
+        sources, targets = list(), list()
+        for columns in reader.iter_columns(
+                ("url_id", "outlink_offsets", "outlink_ids")):
+            url_ids = np.frombuffer(columns["url_id"], dtype=np.uint32)
+            counts = np.diff(np.frombuffer(
+                columns["outlink_offsets"], dtype=np.uint32).astype(np.int64))
+            sources.append(np.repeat(url_ids, counts))
+            targets.append(np.frombuffer(columns["outlink_ids"], dtype=np.uint32))
+        num_nodes = len(reader.strings("urls"))
+        if not sources:
+            return cls(np.zeros(num_nodes + 1, dtype=np.int64),
+                       np.zeros(0, dtype=np.int32))
+        return cls.from_edges(
+            np.concatenate(sources), np.concatenate(targets), num_nodes)
+
+    @property
+    def num_edges(self):
+        return len(self.indices)
+
+    def out_degree(self):
+        return np.diff(self.indptr)
+
+    def in_degree(self):
+        return np.bincount(self.indices, minlength=self.num_nodes)
+
+    def edge_sources(self):
+        ''' Source node of every edge, aligned with self.indices. '''
+        return np.repeat(
+            np.arange(self.num_nodes, dtype=self.indices.dtype), self.out_degree())
+
+    def pagerank(self, damping=0.85, tol=1e-8, max_iter=100):
+        ''' Power-iteration PageRank; rank of dangling nodes is spread uniformly. '''
+        n = self.num_nodes
+        if n == 0:
+            return np.zeros(0)
+        out_degree = self.out_degree()
+        dangling = out_degree == 0
+        inverse_degree = np.zeros(n)
+        inverse_degree[~dangling] = 1.0 / out_degree[~dangling]
+        sources = self.edge_sources()
+        rank = np.full(n, 1.0 / n)
+        for _ in range(max_iter):
+            contributions = (rank * inverse_degree)[sources]
+            new_rank = np.bincount(
+                self.indices, weights=contributions, minlength=n)
+            new_rank *= damping
+            new_rank += (damping * rank[dangling].sum() + 1.0 - damping) / n
+            delta = np.abs(new_rank - rank).sum()
+            rank = new_rank
+            if delta < tol:
+                break
+        return rank
+
+    def connected_components(self):
+        '''
+        Label of the weakly connected component of every node (the smallest
+        node id in the component), via min-label propagation with pointer jumping.
+        '''
+        labels = np.arange(self.num_nodes, dtype=self.indices.dtype)
+        sources = self.edge_sources()
+        targets = self.indices
+        while True:
+            edge_labels = np.minimum(labels[sources], labels[targets])
+            new_labels = labels.copy()
+            np.minimum.at(new_labels, sources, edge_labels)
+            np.minimum.at(new_labels, targets, edge_labels)
+            # Pointer jumping: follow labels to their own labels until stable.
+            while True:
+                jumped = new_labels[new_labels]
+                if np.array_equal(jumped, new_labels):
+                    break
+                new_labels = jumped
+            if np.array_equal(new_labels, labels):
+                return labels
+            labels = new_labels
+
+
+def group_totals(groups, values, num_groups):
+    ''' Sum of values per group id; entries with a negative group are ignored. '''
+    mask = groups >= 0
+    return np.bincount(groups[mask], weights=values[mask], minlength=num_groups)
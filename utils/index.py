@@ -0,0 +1,274 @@
+import os
+import re
+import math
+import mmap
+import heapq
+import struct
+import threading
+from array import array
+
+# Flush the in-memory partial index once its estimated size reaches this.
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024
+RUN_PREFIX = "run-"
+RUN_SUFFIX = ".run"
+# Rough per-term and per-posting memory cost of the in-memory partial index.
+_TERM_OVERHEAD = 200
+_POSTING_SIZE = 8
+_RUN_HEADER = struct.Struct("<HI")   # term length, number of postings
+_QUERY_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Files of a finished index. Binary files are arrays in native byte order.
+POSTINGS_FILE = "postings.bin"   # (doc id, tf) uint32 pairs, grouped by term
+LEXICON_FILE = "lexicon.txt"     # sorted terms, one per line
+OFFSETS_FILE = "lexicon.bin"     # uint64 start of each term's postings (+ end)
+DOCS_FILE = "docs.txt"           # url of each doc id, one per line
+DOC_LENGTHS_FILE = "doclens.bin" # uint32 token count of each doc id
+
+
+def _run_files(directory):
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.startswith(RUN_PREFIX) and name.endswith(RUN_SUFFIX))
+
+
+def _read_run(path):
+    ''' Yield (term, postings bytes) from a partial index file, in term order. '''
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(_RUN_HEADER.size)
+            if len(header) < _RUN_HEADER.size:
+                return
+            term_length, count = _RUN_HEADER.unpack(header)
+            term = f.read(term_length).decode("utf-8")
+            yield term, f.read(count * _POSTING_SIZE)
+
+
+def _tag(source, number):
+    for term, postings in source:
+        yield term, number, postings
+
+
+class IndexBuilder(object):
+    '''
+    Builds an on-disk inverted index (term -> postings of (doc id, tf)).
+    Documents are buffered in an in-memory partial index that is written out
+    as a sorted run whenever it reaches memory_budget; finish() k-way merges
+    the runs (and any index finished by an earlier run) into one index that
+    IndexReader memory-maps.
+    '''
+
+    def __init__(self, directory, restart=False,
+                 memory_budget=DEFAULT_MEMORY_BUDGET):
+        self.directory = directory
+        self.memory_budget = memory_budget
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        if restart:
+            for name in os.listdir(directory):
+                if name.startswith(RUN_PREFIX) or name in (
+                        POSTINGS_FILE, LEXICON_FILE, OFFSETS_FILE,
+                        DOCS_FILE, DOC_LENGTHS_FILE):
+                    os.remove(os.path.join(directory, name))
+        self.num_docs = 0
+        docs_path = os.path.join(directory, DOCS_FILE)
+        if os.path.exists(docs_path):
+            # Binary lines end at "\n" only, like the lines docs.txt is written as.
+            with open(docs_path, "rb") as f:
+                self.num_docs = sum(1 for _ in f)
+        self.run_index = len(_run_files(directory))
+        self._reset()
+
+    def _reset(self):
+        self.partial = dict()    # term -> array of interleaved doc id, tf
+        self.docs = list()
+        self.doc_lengths = array("I")
+        self.memory = 0
+
+    def add_document(self, url, token_counts):
+        ''' Index one document given its token -> count mapping; returns its doc id. '''
+        with self.lock:
+            doc_id = self.num_docs
+            self.num_docs += 1
+            self.docs.append(url)
+            self.doc_lengths.append(sum(token_counts.values()))
+            partial = self.partial
+            for term, tf in token_counts.items():
+                postings = partial.get(term)
+                if postings is None:
+                    postings = partial[term] = array("I")
+                    self.memory += _TERM_OVERHEAD + len(term)
+                postings.append(doc_id)
+                postings.append(tf)
+            self.memory += _POSTING_SIZE * len(token_counts)
+            if self.memory >= self.memory_budget:
+                self._flush()
+            return doc_id
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        if not self.docs:
+            return
+        # Doc table first, so a run never references an unwritten doc id.
+        with open(os.path.join(self.directory, DOCS_FILE), "a",
+                  encoding="utf-8", newline="") as f:
+            f.write("\n".join(self.docs) + "\n")
+        with open(os.path.join(self.directory, DOC_LENGTHS_FILE), "ab") as f:
+            self.doc_lengths.tofile(f)
+        path = os.path.join(
+            self.directory, f"{RUN_PREFIX}{self.run_index:06d}{RUN_SUFFIX}")
+        with open(f"{path}.tmp", "wb") as f:
+            for term in sorted(self.partial):
+                postings = self.partial[term]
+                encoded = term.encode("utf-8")
+                f.write(_RUN_HEADER.pack(len(encoded), len(postings) // 2))
+                f.write(encoded)
+                postings.tofile(f)
+        os.replace(f"{path}.tmp", path)
+        self.run_index += 1
+        self._reset()
+
+    def finish(self):
+        ''' Flush and merge everything into the final index. '''
+        with self.lock:
+            self._flush()
+            runs = _run_files(self.directory)
+            if not runs:
+                return
+            sources = list()
+            previous = None
+            if os.path.exists(os.path.join(self.directory, LEXICON_FILE)):
+                # A previous crawl's index holds the oldest doc ids: merge it first.
+                previous = IndexReader(self.directory)
+                sources.append(previous.iter_terms())
+            sources.extend(_read_run(path) for path in runs)
+            self._merge(sources)
+            if previous is not None:
+                previous.close()
+            for path in runs:
+                os.remove(path)
+
+    close = finish
+
+    def _merge(self, sources):
+        tmp = {name: os.path.join(self.directory, f"{name}.tmp")
+               for name in (POSTINGS_FILE, LEXICON_FILE, OFFSETS_FILE)}
+        offsets = array("Q", [0])
+        # Tag entries with their source so equal terms merge in doc id order.
+        tagged = [_tag(source, number) for number, source in enumerate(sources)]
+        with open(tmp[POSTINGS_FILE], "wb") as postings_file, \
+                open(tmp[LEXICON_FILE], "w", encoding="utf-8") as lexicon_file:
+            current, position = None, 0
+            for term, _, postings in heapq.merge(*tagged):
+                if term != current:
+                    if current is not None:
+                        lexicon_file.write(current + "\n")
+                        offsets.append(position)
+                    current = term
+                postings_file.write(postings)
+                position += len(postings) // _POSTING_SIZE
+            if current is not None:
+                lexicon_file.write(current + "\n")
+                offsets.append(position)
+        with open(tmp[OFFSETS_FILE], "wb") as f:
+            offsets.tofile(f)
+        for name, path in tmp.items():
+            os.replace(path, os.path.join(self.directory, name))
+
+
+class IndexReader(object):
+    ''' Boolean and TF-IDF queries over an index written by IndexBuilder. '''
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, LEXICON_FILE), encoding="utf-8") as f:
+            self.terms = {term: i for i, term in enumerate(f.read().splitlines())}
+        self.offsets = self._load_array("Q", OFFSETS_FILE)
+        self.doc_lengths = self._load_array("I", DOC_LENGTHS_FILE)
+        self.num_docs = len(self.doc_lengths)
+        self._docs = None
+        self._postings_file = open(os.path.join(directory, POSTINGS_FILE), "rb")
+        size = os.fstat(self._postings_file.fileno()).st_size
+        self._postings = (
+            mmap.mmap(self._postings_file.fileno(), 0, access=mmap.ACCESS_READ)
+            if size else b"")
+
+    def _load_array(self, typecode, name):
+        values = array(typecode)
+        with open(os.path.join(self.directory, name), "rb") as f:
+            values.frombytes(f.read())
+        return values
+
+    def close(self):
+        if isinstance(self._postings, mmap.mmap):
+            self._postings.close()
+        self._postings_file.close()
+
+    def url(self, doc_id):
+        if self._docs is None:
+            with open(os.path.join(self.directory, DOCS_FILE),
+                      encoding="utf-8", newline="") as f:
+                # Not splitlines(): urls can hold \r, \x0b, \u2028 and other line breaks.
+                self._docs = f.read().split("\n")[:-1]
+        return self._docs[doc_id]
+
+    def _postings_bytes(self, i):
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self._postings[start * _POSTING_SIZE:end * _POSTING_SIZE]
+
+    def postings(self, term):
+        ''' (doc ids, tfs) arrays of term; empty if the term is not indexed. '''
+        i = self.terms.get(term)
+        pairs = array("I")
+        if i is not None:
+            pairs.frombytes(self._postings_bytes(i))
+        return pairs[0::2], pairs[1::2]
+
+    def document_frequency(self, term):
+        i = self.terms.get(term)
+        return 0 if i is None else self.offsets[i + 1] - self.offsets[i]
+
+    def iter_terms(self):
+        ''' Yield (term, postings bytes) in term order (the run format). '''
+        for term, i in sorted(self.terms.items()):
+            yield term, bytes(self._postings_bytes(i))
+
+    @staticmethod
+    def query_terms(query):
+        # Same token rules as the crawler: lowercase ASCII alphanumerics.
+        return _QUERY_TOKEN.findall(query.lower())
+
+    def boolean(self, query, operator="and"):
+        ''' Sorted doc ids containing all ("and") or any ("or") query terms. '''
+        terms = sorted(set(self.query_terms(query)), key=self.document_frequency)
+        if not terms:
+            return list()
+        if operator == "or":
+            docs = set()
+            for term in terms:
+                docs.update(self.postings(term)[0])
+            return sorted(docs)
+        # Intersect starting from the rarest term.
+        docs = set(self.postings(terms[0])[0])
+        for term in terms[1:]:
+            if not docs:
+                break
+            docs.intersection_update(self.postings(term)[0])
+        return sorted(docs)
+
+    def search(self, query, k=10):
+        ''' Top k (score, doc id) by log-tf * idf, normalized by sqrt(doc length). '''
+        scores = dict()
+        for term in set(self.query_terms(query)):
+            doc_ids, tfs = self.postings(term)
+            if not doc_ids:
+                continue
+            idf = math.log(self.num_docs / len(doc_ids))
+            for doc_id, tf in zip(doc_ids, tfs):
+                scores[doc_id] = scores.get(doc_id, 0.0) + (1 + math.log(tf)) * idf
+        doc_lengths = self.doc_lengths
+        return heapq.nlargest(
+            k, ((score / math.sqrt(doc_lengths[doc_id] or 1), doc_id)
+                for doc_id, score in scores.items()))
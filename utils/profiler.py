@@ -0,0 +1,169 @@
+import os
+import sys
+import time
+import threading
+from collections import Counter
+
+# While the profiler is off it only checks for the control file this often.
+POLL_INTERVAL = 1.0
+# The profiler is on while this file exists in its directory (or after SIGUSR1).
+CONTROL_FILE = "profile.on"
+
+# Set while the profiler is sampling; TimedLock only times acquires then.
+_timing = False
+_stats_lock = threading.Lock()
+_lock_stats = dict()   # lock name -> [acquisitions, contended, wait seconds, max wait]
+
+
+def _record_wait(name, wait):
+    with _stats_lock:
+        stats = _lock_stats.get(name)
+        if stats is None:
+            stats = _lock_stats[name] = [0, 0, 0.0, 0.0]
+        stats[0] += 1
+        if wait:
+            stats[1] += 1
+            stats[2] += wait
+            stats[3] = max(stats[3], wait)
+
+
+def take_lock_stats():
+    ''' Return and reset the {name: [acquisitions, contended, wait s, max wait s]} counters. '''
+    global _lock_stats
+    with _stats_lock:
+        stats, _lock_stats = _lock_stats, dict()
+    return stats
+
+
+class TimedLock(object):
+    '''
+    Named wrapper around a Lock or RLock. While the profiler is on, it records
+    how often and how long threads wait to acquire it; otherwise it only adds
+    a flag check to each acquire.
+    '''
+
+    def __init__(self, name, lock=None):
+        self.name = name
+        self._lock = lock if lock is not None else threading.Lock()
+        self.release = self._lock.release
+
+    def acquire(self, blocking=True, timeout=-1):
+        if not _timing:
+            return self._lock.acquire(blocking, timeout)
+        if self._lock.acquire(False):
+            _record_wait(self.name, 0.0)
+            return True
+        if not blocking:
+            return False
+        start = time.perf_counter()
+        acquired = self._lock.acquire(True, timeout)
+        _record_wait(self.name, time.perf_counter() - start)
+        return acquired
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._lock.release()
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class SamplingProfiler(threading.Thread):
+    '''
+    Samples the stacks of the threads returned by get_threads `rate` times a
+    second while on, and every `window` seconds writes them in collapsed-stack
+    format (profile-*.folded, flamegraph.pl / speedscope ready) along with the
+    TimedLock wait times of the window (profile-*.locks.txt).
+    '''
+
+    def __init__(self, directory, get_threads, rate=100, window=10, logger=None):
+        super().__init__(daemon=True, name="Profiler")
+        self.directory = directory
+        self.get_threads = get_threads
+        self.interval = 1.0 / rate
+        self.window = window
+        self.logger = logger
+        self.control_file = os.path.join(directory, CONTROL_FILE)
+        self.toggled = False
+        self.dump_count = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def toggle(self, signum=None, frame=None):
+        ''' Switch the profiler on or off; usable as a signal handler. '''
+        self.toggled = not self.toggled
+
+    def enabled(self):
+        return self.toggled or os.path.exists(self.control_file)
+
+    def run(self):
+        global _timing
+        while True:
+            if not self.enabled():
+                time.sleep(POLL_INTERVAL)
+                continue
+            take_lock_stats()
+            _timing = True
+            self._log("Profiler on.")
+            while self._profile_window():
+                pass
+            _timing = False
+            self._log("Profiler off.")
+
+    def _profile_window(self):
+        ''' Sample until the window ends or the profiler is switched off; True to go on. '''
+        samples = Counter()
+        start = time.time()
+        deadline = time.monotonic() + self.window
+        enabled = True
+        while time.monotonic() < deadline:
+            self.sample(samples)
+            time.sleep(self.interval)
+            enabled = self.enabled()
+            if not enabled:
+                break
+        self.dump(samples, start, time.time())
+        return enabled
+
+    def sample(self, samples):
+        ''' Add one stack per live thread to samples, root frame (the thread name) first. '''
+        frames = sys._current_frames()
+        for thread in self.get_threads():
+            frame = frames.get(thread.ident)
+            stack = list()
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                stack.append(thread.name)
+                samples[";".join(reversed(stack))] += 1
+
+    def dump(self, samples, start, end):
+        self.dump_count += 1
+        prefix = os.path.join(
+            self.directory,
+            f"profile-{time.strftime('%Y%m%d-%H%M%S', time.localtime(start))}"
+            f"-{self.dump_count:04d}")
+        with open(f"{prefix}.folded", "w") as f:
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+        lock_stats = take_lock_stats()
+        with open(f"{prefix}.locks.txt", "w") as f:
+            f.write(f"Window: {end - start:.1f}s, {sum(samples.values())} samples\n")
+            f.write("lock, acquisitions, contended, wait ms, max wait ms\n")
+            for name, (count, contended, wait, max_wait) in sorted(lock_stats.items()):
+                f.write(
+                    f"{name}, {count}, {contended}, "
+                    f"{wait * 1000:.1f}, {max_wait * 1000:.1f}\n")
+        waits = ", ".join(
+            f"{name} {stats[2] * 1000:.0f} ms"
+            for name, stats in sorted(lock_stats.items()))
+        self._log(f"Profile written to {prefix}.folded (lock waits: {waits or 'none'}).")
+
+    def _log(self, message):
+        if self.logger is not None:
+            self.logger.info(message)
\ No newline at end of file
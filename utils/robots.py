@@ -0,0 +1,176 @@
+import re
+import time
+from threading import Lock
+from urllib.parse import urlsplit
+
+from utils.download import download
+
+# Rules are cached per (scheme, netloc) for this many seconds by default.
+DEFAULT_TTL = 24 * 60 * 60
+# A robots.txt that could not be fetched (5xx, or a 6xx cache server error)
+# disallows the whole host, as RFC 9309 asks, but is retried after this long.
+ERROR_TTL = 10 * 60
+
+
+class RobotsRules(object):
+    ''' Compiled allow/disallow rules of one robots.txt group. '''
+
+    def __init__(self, rules=(), crawl_delay=None, sitemaps=(), unavailable=False):
+        # (pattern length, is allow, prefix or compiled regex). Sorted so the
+        # first match is the longest pattern, with allow winning ties.
+        self.rules = sorted(
+            ((len(pattern), allow, self._compile(pattern))
+             for pattern, allow in rules),
+            key=lambda rule: (-rule[0], not rule[1]))
+        self.crawl_delay = crawl_delay
+        self.sitemaps = list(sitemaps)
+        # True for the stand-in rules of a robots.txt that could not be fetched.
+        self.unavailable = unavailable
+
+    @staticmethod
+    def _compile(pattern):
+        if "*" not in pattern and not pattern.endswith("$"):
+            # Plain prefix: str.startswith is much faster than a regex.
+            return pattern
+        anchored = pattern.endswith("$")
+        if anchored:
+            pattern = pattern[:-1]
+        regex = ".*".join(re.escape(part) for part in pattern.split("*"))
+        return re.compile(regex + ("$" if anchored else ""))
+
+    def allowed(self, url):
+        parsed = urlsplit(url)
+        target = parsed.path or "/"
+        if target == "/robots.txt":
+            return True
+        if parsed.query:
+            target = f"{target}?{parsed.query}"
+        for _, allow, matcher in self.rules:
+            if isinstance(matcher, str):
+                if target.startswith(matcher):
+                    return allow
+            elif matcher.match(target):
+                return allow
+        return True
+
+
+def parse_robots(text, user_agent):
+    ''' Parse robots.txt text into the RobotsRules for user_agent. '''
+    agent = user_agent.lower()
+    groups = list()     # [(agents, rules, crawl_delay)]
+    sitemaps = list()
+    agents, rules, delay = list(), list(), None
+    in_rules = False
+    for line in text.splitlines():
+        line = line.split("#", 1)[0].strip()
+        if ":" not in line:
+            continue
+        field, value = line.split(":", 1)
+        field, value = field.strip().lower(), value.strip()
+        if field == "sitemap":
+            if value:
+                sitemaps.append(value)
+        elif field == "user-agent":
+            if in_rules:
+                # A user-agent line after rules starts a new group.
+                groups.append((agents, rules, delay))
+                agents, rules, delay = list(), list(), None
+                in_rules = False
+            agents.append(value.lower())
+        elif field in ("allow", "disallow"):
+            in_rules = True
+            # An empty Disallow means "allow everything".
+            if value:
+                rules.append((value, field == "allow"))
+        elif field == "crawl-delay":
+            in_rules = True
+            try:
+                delay = float(value)
+            except ValueError:
+                pass
+    if agents:
+        groups.append((agents, rules, delay))
+
+    # The most specific matching agent wins, "*" is the fallback.
+    best, best_len = None, -1
+    for group_agents, group_rules, group_delay in groups:
+        for name in group_agents:
+            if name == "*":
+                match_len = 0
+            elif name and agent.startswith(name):
+                match_len = len(name)
+            else:
+                continue
+            if match_len > best_len:
+                best, best_len = (group_rules, group_delay), match_len
+    if best is None:
+        return RobotsRules(sitemaps=sitemaps)
+    return RobotsRules(best[0], best[1], sitemaps)
+
+
+class RobotsCache(object):
+    ''' Per-host robots.txt rules fetched through the cache server. '''
+
+    def __init__(self, config, logger, ttl=DEFAULT_TTL):
+        self.config = config
+        self.logger = logger
+        self.ttl = ttl
+        self.entries = dict()   # (scheme, netloc) -> (rules, expires_at)
+        # One fetch per host at a time: (scheme, netloc) -> Lock, guarded by self.lock.
+        self.fetch_locks = dict()
+        self.lock = Lock()
+
+    def lookup(self, url):
+        ''' Return (rules, fetched) where fetched is True on a fresh download. '''
+        parsed = urlsplit(url)
+        key = (parsed.scheme, parsed.netloc)
+        entry = self.entries.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0], False
+        with self.lock:
+            fetch_lock = self.fetch_locks.setdefault(key, Lock())
+        with fetch_lock:
+            # Another worker may have fetched it while this one waited.
+            entry = self.entries.get(key)
+            now = time.monotonic()
+            if entry is not None and entry[1] > now:
+                return entry[0], False
+            rules, ttl = self._fetch(f"{parsed.scheme}://{parsed.netloc}/robots.txt")
+            self.entries[key] = (rules, now + ttl)
+        return rules, True
+
+    def allowed(self, url):
+        return self.lookup(url)[0].allowed(url)
+
+    def expires_at(self, url):
+        ''' time.monotonic() at which the cached rules of the url's host are fetched again. '''
+        parsed = urlsplit(url)
+        entry = self.entries.get((parsed.scheme, parsed.netloc))
+        return entry[1] if entry is not None else time.monotonic()
+
+    def crawl_delay(self, url):
+        return self.lookup(url)[0].crawl_delay or 0.0
+
+    def _fetch(self, robots_url):
+        ''' Return (rules, seconds to cache them). '''
+        resp = download(robots_url, self.config, self.logger)
+        time.sleep(self.config.time_delay)
+        if resp.status >= 500:
+            # Unreachable robots.txt: assume everything is disallowed for now.
+            self.logger.info(
+                f"Could not fetch {robots_url}, status <{resp.status}>, "
+                f"disallowing the host for {ERROR_TTL}s.")
+            return RobotsRules([("/", False)], unavailable=True), ERROR_TTL
+        if (resp.status != 200 or resp.raw_response is None
+                or not resp.raw_response.content):
+            # Missing robots.txt: everything is allowed.
+            self.logger.info(
+                f"No robots.txt at {robots_url}, status <{resp.status}>.")
+            return RobotsRules(), self.ttl
+        # utf-8-sig drops a leading BOM that would hide the first line.
+        text = resp.raw_response.content.decode("utf-8-sig", errors="ignore")
+        rules = parse_robots(text, self.config.user_agent)
+        self.logger.info(
+            f"Loaded {len(rules.rules)} robots rules and "
+            f"{len(rules.sitemaps)} sitemaps from {robots_url}.")
+        return rules, self.ttl
@@ -1,8 +1,7 @@
 import os
-from spacetime import Node
-from utils.pcc_models import Register
 
 def init(df, user_agent, fresh):
+    from utils.pcc_models import Register
     reg = df.read_one(Register, user_agent)
     if not reg:
         reg = Register(user_agent, fresh)
@@ -19,8 +18,31 @@ def init(df, user_agent, fresh):
             df.push()
     return reg.load_balancer
 
+def parse_cache_server(address):
+    host, _, port = address.strip().rpartition(":")
+    if not host or not port.isdigit():
+        raise ValueError(f"Cache server should be host:port, got {address!r}.")
+    return host, int(port)
+
 def get_cache_server(config, restart):
+    # An explicit address skips registration entirely.
+    if config.cache_server_override:
+        return parse_cache_server(config.cache_server_override)
+    # Reuse the address from the last registration for this save file, as long
+    # as the crawl resumes from it (deleting the save file restarts the crawl).
+    cache_file = f"{config.save_file}.cache_server"
+    if (not restart and os.path.exists(config.save_file)
+            and os.path.exists(cache_file)):
+        with open(cache_file) as f:
+            return parse_cache_server(f.read())
+    # spacetime is only needed (and only imported) to register.
+    from spacetime import Node
+    from utils.pcc_models import Register
     init_node = Node(
         init, Types=[Register], dataframe=(config.host, config.port))
-    return init_node.start(
-        config.user_agent, restart or not os.path.exists(config.save_file))
\ No newline at end of file
+    cache_server = init_node.start(
+        config.user_agent, restart or not os.path.exists(config.save_file))
+    host, port = cache_server
+    with open(cache_file, "w") as f:
+        f.write(f"{host}:{port}")
+    return cache_server
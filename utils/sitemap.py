@@ -0,0 +1,45 @@
+import gzip
+import io
+from xml.etree.ElementTree import iterparse, ParseError
+
+
+def iter_sitemap(content):
+    '''
+    Stream (kind, loc) pairs out of a sitemap body without building the tree.
+    kind is "url" for pages and "sitemap" for entries of a sitemap index.
+    Gzipped and plain-text (one url per line) sitemaps are also accepted.
+    '''
+    if not content:
+        return
+    stream = io.BytesIO(content)
+    if content[:2] == b"\x1f\x8b":
+        stream = gzip.GzipFile(fileobj=stream)
+    head = stream.read(512)
+    stream.seek(0)
+    if not head.lstrip().startswith(b"<"):
+        for line in io.TextIOWrapper(stream, encoding="utf-8", errors="ignore"):
+            line = line.strip()
+            if line:
+                yield "url", line
+        return
+
+    root = None
+    loc = None
+    try:
+        for event, elem in iterparse(stream, events=("start", "end")):
+            if event == "start":
+                if root is None:
+                    root = elem
+                continue
+            tag = elem.tag.rsplit("}", 1)[-1]
+            if tag == "loc":
+                loc = (elem.text or "").strip()
+            elif tag in ("url", "sitemap"):
+                if loc:
+                    yield tag, loc
+                loc = None
+                # Drop finished entries so memory stays flat on huge files.
+                root.clear()
+    except (ParseError, OSError, EOFError):
+        # Truncated or malformed sitemap: keep whatever was yielded so far.
+        return
@@ -0,0 +1,326 @@
+import sys
+import heapq
+from array import array
+from bisect import bisect_right
+from contextlib import nullcontext
+
+# Keys per front-coded block: longer blocks are smaller but slower to search.
+BLOCK_SIZE = 16
+# New urls are kept uncompressed until this many are buffered.
+BUFFER_SIZE = 4096
+# The newest runs are merged into the previous one while together they are at
+# least 1/MERGE_RATIO of its size, so there are O(log n) runs of geometrically
+# decreasing size. Higher means fewer runs to search but more rewriting.
+MERGE_RATIO = 8
+
+
+def _split(url):
+    # "scheme://host" (or just "host" for scheme-less keys) and the rest.
+    start = url.find("://")
+    start = start + 3 if start >= 0 else 0
+    end = url.find("/", start)
+    if end < 0:
+        return url, ""
+    return url[:end], url[end:]
+
+
+def _put_varint(buffer, value):
+    while value >= 0x80:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _get_varint(data, pos):
+    value, shift = 0, 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class _Run(object):
+    '''
+    Immutable sorted keys, front-coded in blocks of BLOCK_SIZE: each block
+    stores its first key in full (in heads) and every following key in data
+    as (shared prefix length, suffix length, suffix) against the previous one.
+    '''
+
+    def __init__(self, sorted_keys):
+        self.heads = list()
+        self.offsets = array("I")
+        data = bytearray()
+        prev = b""
+        count = 0
+        for key in sorted_keys:
+            if count % BLOCK_SIZE == 0:
+                self.heads.append(key)
+                self.offsets.append(len(data))
+            else:
+                shared = 0
+                limit = min(len(prev), len(key))
+                while shared < limit and prev[shared] == key[shared]:
+                    shared += 1
+                _put_varint(data, shared)
+                _put_varint(data, len(key) - shared)
+                data += key[shared:]
+            prev = key
+            count += 1
+        self.offsets.append(len(data))
+        self.data = bytes(data)
+        self.count = count
+
+    def _block(self, block):
+        ''' Yield the keys of one block in order. '''
+        key = self.heads[block]
+        yield key
+        data = self.data
+        pos, end = self.offsets[block], self.offsets[block + 1]
+        while pos < end:
+            shared = data[pos]
+            if shared < 0x80:
+                pos += 1
+            else:
+                shared, pos = _get_varint(data, pos)
+            length = data[pos]
+            if length < 0x80:
+                pos += 1
+            else:
+                length, pos = _get_varint(data, pos)
+            key = key[:shared] + data[pos:pos + length]
+            pos += length
+            yield key
+
+    def __contains__(self, key):
+        block = bisect_right(self.heads, key) - 1
+        if block < 0:
+            return False
+        head = self.heads[block]
+        if head == key:
+            return True
+        # Walk the block without rebuilding keys: matched is the common prefix
+        # length of key and the previous entry, which sorts before key.
+        matched = 0
+        limit = min(len(head), len(key))
+        while matched < limit and head[matched] == key[matched]:
+            matched += 1
+        data = self.data
+        pos, end = self.offsets[block], self.offsets[block + 1]
+        while pos < end:
+            shared = data[pos]
+            if shared < 0x80:
+                pos += 1
+            else:
+                shared, pos = _get_varint(data, pos)
+            length = data[pos]
+            if length < 0x80:
+                pos += 1
+            else:
+                length, pos = _get_varint(data, pos)
+            if shared < matched:
+                # Differs from the previous entry where that one matched key,
+                # and sorts after it: past key.
+                return False
+            if shared == matched:
+                suffix = data[pos:pos + length]
+                rest = key[matched:]
+                if suffix >= rest:
+                    return suffix == rest
+                limit = min(length, len(rest))
+                i = 0
+                while i < limit and suffix[i] == rest[i]:
+                    i += 1
+                matched += i
+            # shared > matched: same byte as the previous entry where that one
+            # sorted before key, so this entry does too.
+            pos += length
+        return False
+
+    def __iter__(self):
+        for block in range(len(self.heads)):
+            yield from self._block(block)
+
+    def memory_size(self):
+        return (sys.getsizeof(self.data) + sys.getsizeof(self.offsets)
+                + sys.getsizeof(self.heads)
+                + sum(sys.getsizeof(head) for head in self.heads))
+
+
+class UrlSet(object):
+    '''
+    Set of urls stored compactly: "scheme://host" parts are interned to ints
+    and the rest of each url is front-coded in sorted runs (see _Run), so urls
+    sharing a host and path prefix cost a few bytes each instead of a str
+    object. Supports add, update, in, len, iteration (sorted by host, then
+    path) and clear; urls cannot be removed one by one. Not thread safe,
+    but see merge: adds never merge runs, owners call merge after them.
+    '''
+
+    def __init__(self, urls=()):
+        self.hosts = list()
+        self._host_ids = dict()
+        self._pending = set()   # keys added since the last flush
+        self._runs = list()     # oldest (largest) first
+        self._count = 0
+        self._merge_due = False
+        self._merging = False
+        self.update(urls)
+
+    def _key(self, url, create=False):
+        ''' Sortable bytes key: 4-byte host id then the utf-8 rest of the url. '''
+        host, rest = _split(url)
+        host_id = self._host_ids.get(host)
+        if host_id is None:
+            if not create:
+                return None
+            host_id = self._host_ids[host] = len(self.hosts)
+            self.hosts.append(host)
+        return host_id.to_bytes(4, "big") + rest.encode("utf-8")
+
+    def _contains_key(self, key):
+        if key in self._pending:
+            return True
+        for run in self._runs:
+            if key in run:
+                return True
+        return False
+
+    def __contains__(self, url):
+        key = self._key(url)
+        return key is not None and self._contains_key(key)
+
+    def add(self, url):
+        ''' Add url; returns True if it was not in the set yet. '''
+        key = self._key(url, create=True)
+        if self._contains_key(key):
+            return False
+        self._pending.add(key)
+        self._count += 1
+        if len(self._pending) >= BUFFER_SIZE:
+            self._flush()
+        return True
+
+    def update(self, urls):
+        if not self._count:
+            if isinstance(urls, UrlSet):
+                # Restoring a snapshot: share its compressed runs.
+                other = urls.copy()
+                self.hosts, self._host_ids = other.hosts, other._host_ids
+                self._runs, self._count = other._runs, other._count
+                self._merge_due = other._merge_due
+                return
+            # Bulk load into an empty set: one sort into a single run, no lookups.
+            keys = {self._key(url, create=True) for url in urls}
+            if keys:
+                self._runs = [_Run(sorted(keys))]
+                self._count = len(keys)
+            return
+        for url in urls:
+            self.add(url)
+        self.merge()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        self._runs.append(_Run(sorted(self._pending)))
+        self._pending = set()
+        self._merge_due = len(self._runs) > 1
+
+    def _runs_to_merge(self):
+        runs = self._runs
+        start = len(runs) - 1
+        total = runs[start].count if runs else 0
+        while start > 0 and total * MERGE_RATIO >= runs[start - 1].count:
+            start -= 1
+            total += runs[start].count
+        return runs[start:]
+
+    def merge(self, lock=None):
+        '''
+        Merge the runs that are due. lock is the one guarding this set: it is
+        held only to pick the runs and to swap the merged run in, so other
+        threads keep using the set while the (immutable) runs are merged,
+        which takes seconds for millions of urls. One merge at a time; if
+        another thread is merging, return at once.
+        '''
+        lock = lock or nullcontext()
+        while self._merge_due:
+            with lock:
+                runs = self._runs_to_merge()
+                if len(runs) < 2:
+                    self._merge_due = False
+                    return
+                if self._merging:
+                    return
+                self._merging = True
+            merged = None
+            try:
+                merged = _Run(heapq.merge(*runs))
+            finally:
+                with lock:
+                    self._merging = False
+                    if merged is not None:
+                        self._replace_runs(runs, merged)
+
+    def _replace_runs(self, runs, merged):
+        # Adds only append runs, but clear or update may have dropped these.
+        for start, run in enumerate(self._runs):
+            if run is runs[0]:
+                end = start + len(runs)
+                if all(a is b for a, b in zip(self._runs[start:end], runs)):
+                    self._runs[start:end] = [merged]
+                return
+
+    def copy(self):
+        ''' Independent copy; cheap, as the compressed runs are immutable and shared. '''
+        self._flush()
+        other = UrlSet()
+        other.hosts = list(self.hosts)
+        other._host_ids = dict(self._host_ids)
+        other._runs = list(self._runs)
+        other._count = self._count
+        other._merge_due = self._merge_due
+        return other
+
+    def clear(self):
+        self.hosts = list()
+        self._host_ids = dict()
+        self._pending = set()
+        self._runs = list()
+        self._count = 0
+        self._merge_due = False
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        hosts = self.hosts
+        sources = [iter(run) for run in self._runs]
+        sources.append(iter(sorted(self._pending)))
+        for key in heapq.merge(*sources):
+            yield hosts[int.from_bytes(key[:4], "big")] + key[4:].decode("utf-8")
+
+    def __getstate__(self):
+        # Pickle compressed: fold the pending urls into the runs first.
+        self._flush()
+        state = self.__dict__.copy()
+        del state["_host_ids"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._host_ids = {host: i for i, host in enumerate(self.hosts)}
+        # Not merging, whatever the pickled set was doing (older pickles lack these).
+        self._merging = False
+        self._merge_due = len(self._runs) > 1
+
+    def memory_size(self):
+        ''' Approximate bytes used, containers included. '''
+        return (sys.getsizeof(self.hosts) + sys.getsizeof(self._host_ids)
+                + sum(sys.getsizeof(host) for host in self.hosts)
+                + sys.getsizeof(self._pending)
+                + sum(sys.getsizeof(key) for key in self._pending)
+                + sum(run.memory_size() for run in self._runs))
\ No newline at end of file